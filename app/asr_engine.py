@@ -1,60 +1,226 @@
-import time, queue, threading, numpy as np
-import sounddevice as sd
+import time, queue, threading, collections, itertools, numpy as np
 import requests
-from faster_whisper import WhisperModel
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait as futures_wait
+
+from audio_ring import AudioRing
+from audio_source import DeviceSource
+from model_cache import get_model
 
 class EnergyVadChunker:
-    def __init__(self, sr=16000, frame_ms=20, min_chunk_ms=600, max_sil_ms=350, thresh_mult=2.5):
+    """
+    Energy VAD that cuts a mono float32 stream into speech chunks.
+    Frames are classified a block at a time with NumPy. The threshold follows a
+    rolling noise floor (the `noise_percentile` of frame RMS over the last
+    `noise_window_ms`) times `thresh_mult`, with hysteresis: a frame stays voiced
+    until its energy drops below `hysteresis` × threshold. The floor survives
+    chunk cuts, so only the very first second is calibration. The floor is
+    recomputed every FLOOR_EVERY frames from the frames before that point, so
+    feeding frame by frame or in blocks of any size gives the same cuts.
+    """
+    FLOOR_EVERY = 25  # 0.5 s
+
+    def __init__(self, sr=16000, frame_ms=20, min_chunk_ms=600, max_sil_ms=350, thresh_mult=2.5,
+                 noise_window_ms=10000, noise_percentile=10.0, hysteresis=0.7):
         self.sr = sr
         self.frame_ms = frame_ms
         self.frame_len = sr * frame_ms // 1000
         self.min_frames = max(1, min_chunk_ms // frame_ms)
         self.max_sil_frames = max(1, max_sil_ms // frame_ms)
+        self.max_frames = int(30000 / frame_ms)  # 强制切分：30s
         self.thresh_mult = thresh_mult
+        self.noise_percentile = float(noise_percentile)
+        self.hysteresis = float(hysteresis)
         self.calibrating_frames = max(1, int(1000 / frame_ms))  # ~1s
+        self._hist = np.zeros(max(self.calibrating_frames, noise_window_ms // frame_ms), dtype=np.float32)
+        self._hist_n = 0
+        self.energy_thresh = None
+        self._was_voiced = False
         self.reset()
 
+    def set_limits(self, min_chunk_ms: int, max_sil_ms: int):
+        # 运行中调整（ChunkController），从下一帧起生效
+        self.min_frames = max(1, int(min_chunk_ms) // self.frame_ms)
+        self.max_sil_frames = max(1, int(max_sil_ms) // self.frame_ms)
+
     def reset(self):
-        self.frames = []
+        # 只清当前 chunk 的计数，噪声底保留
+        self.n_frames = 0
         self.voiced = 0
         self.sil = 0
-        self.energy_thresh = None
-        self._calib = []
 
-    @staticmethod
-    def _rms(f32: np.ndarray) -> float:
-        return float(np.sqrt(np.mean(np.square(f32), dtype=np.float32)))
-
-    def _is_voiced(self, f32: np.ndarray) -> bool:
-        e = self._rms(f32)
-        if self.energy_thresh is None:
-            self._calib.append(e)
-            if len(self._calib) >= self.calibrating_frames:
-                base = np.median(np.asarray(self._calib, dtype=np.float32))
-                self.energy_thresh = max(1e-4, float(base) * self.thresh_mult)
-            return False
-        return e > self.energy_thresh
-
-    def process(self, pcm16: bytes):
-        f32 = (np.frombuffer(pcm16, dtype=np.int16).astype(np.float32) / 32768.0)
-        voiced = self._is_voiced(f32)
-        self.frames.append(pcm16)
-        if voiced:
-            self.voiced += 1
-            self.sil = 0
+    def _frame_rms(self, f32: np.ndarray) -> np.ndarray:
+        k = len(f32) // self.frame_len
+        frames = f32[:k * self.frame_len].reshape(k, self.frame_len)
+        return np.sqrt(np.square(frames).sum(axis=1) / np.float32(self.frame_len))
+
+    def _thresholds(self, e: np.ndarray) -> np.ndarray:
+        # 噪声底只在固定帧数边界（每 FLOOR_EVERY 帧）上、用边界之前的历史重算，
+        # 所以逐帧喂和整块喂得到同样的阈值；同时把这些帧记入历史。校准期内为 NaN
+        thr = np.empty(len(e))
+        R = self.FLOOR_EVERY
+        j = 0
+        while j < len(e):
+            if self._hist_n % R == 0:
+                filled = min(self._hist_n, len(self._hist))
+                if filled >= self.calibrating_frames:
+                    floor = float(np.percentile(self._hist[:filled], self.noise_percentile))
+                    self.energy_thresh = max(1e-4, floor * self.thresh_mult)
+            k = min(len(e), j + R - self._hist_n % R)
+            thr[j:k] = np.nan if self.energy_thresh is None else self.energy_thresh
+            self._update_floor(e[j:k])
+            j = k
+        return thr
+
+    def _update_floor(self, e: np.ndarray):
+        # 能量历史环 + 分位数，房间噪声变了阈值会跟着走
+        h = self._hist
+        W = len(h)
+        if len(e) >= W:
+            h[:] = e[-W:]
         else:
-            self.sil += 1
-        if self.energy_thresh is None:
-            return None
-        if self.voiced >= self.min_frames and self.sil >= self.max_sil_frames:
-            data = b"".join(self.frames)
+            i = self._hist_n % W
+            first = min(len(e), W - i)
+            h[i:i + first] = e[:first]
+            h[:len(e) - first] = e[first:]
+        self._hist_n += len(e)
+
+    def _classify(self, e: np.ndarray, on: np.ndarray) -> np.ndarray:
+        # 迟滞：高于 on 为语音，低于 off 为静音，中间沿用前一帧状态
+        off = on * self.hysteresis
+        state = np.where(e > on, 1, np.where(e < off, 0, -1))
+        last = np.where(state >= 0, np.arange(len(e)), -1)
+        np.maximum.accumulate(last, out=last)
+        prev = 1 if self._was_voiced else 0
+        voiced = np.where(last >= 0, state[np.maximum(last, 0)], prev).astype(bool)
+        self._was_voiced = bool(voiced[-1])
+        return voiced
+
+    def process_block(self, f32: np.ndarray) -> list:
+        """
+        Feed a block of whole frames (usually a view into the capture AudioRing).
+        Returns a list of (end, n): a chunk of n samples ends at sample offset
+        `end` of this block, i.e. covers block-relative [end - n, end); end - n
+        may be negative when the chunk started in an earlier block.
+        """
+        e = self._frame_rms(f32)
+        if not len(e):
+            return []
+        thr = self._thresholds(e)
+        if len(e) == 1:
+            return self._step(float(e[0]), float(thr[0]))  # 实时采集多半一次一帧：纯 Python 更快
+        k = int(np.isnan(thr).sum())  # 还在校准的帧，只可能在块首
+        if k:
+            self.sil += k
+            self.n_frames = min(self.n_frames + k, self.max_sil_frames)
+            if k == len(e):
+                return []
+        v = self._classify(e[k:], thr[k:])
+        lead = self.max_sil_frames  # 语音前最多保留这么多帧静音
+        cuts = []
+        base = 0
+        while base < len(v):
+            seg = v[base:]
+            i = np.arange(1, len(seg) + 1)
+            voiced = self.voiced + np.cumsum(seg)
+            last = np.where(seg, i, 0)
+            np.maximum.accumulate(last, out=last)
+            sil = np.where(last > 0, i - last, self.sil + i)
+            n = self.n_frames + i
+            if self.voiced == 0:
+                # 还没出现语音：chunk 起点跟着后移，前导静音不送 Whisper
+                f = int(np.argmax(seg)) if seg.any() else len(seg)
+                n = np.where(i <= f, np.minimum(n, lead), min(self.n_frames + f, lead) + (i - f))
+            cond = ((voiced >= self.min_frames) & (sil >= self.max_sil_frames)) | (n > self.max_frames)
+            if not cond.any():
+                self.n_frames, self.voiced, self.sil = int(n[-1]), int(voiced[-1]), int(sil[-1])
+                break
+            c = int(np.argmax(cond))
+            cuts.append(((k + base + c + 1) * self.frame_len, int(n[c]) * self.frame_len))
             self.reset()
-            return data
-        if len(self.frames) > int(30000 / self.frame_ms):
-            data = b"".join(self.frames)
+            base += c + 1
+        return cuts
+
+    def _step(self, e: float, on: float) -> list:
+        # process_block 对单帧的等价写法（同样的迟滞、前导静音和切分条件）
+        if on != on:  # NaN：还在校准
+            self.sil += 1
+            self.n_frames = min(self.n_frames + 1, self.max_sil_frames)
+            return []
+        v = e > on or (e >= on * self.hysteresis and self._was_voiced)
+        self._was_voiced = v
+        if self.voiced == 0:
+            n = min(self.n_frames, self.max_sil_frames) + 1 if v else min(self.n_frames + 1, self.max_sil_frames)
+        else:
+            n = self.n_frames + 1
+        self.voiced += v
+        self.sil = 0 if v else self.sil + 1
+        self.n_frames = n
+        if (self.voiced >= self.min_frames and self.sil >= self.max_sil_frames) or n > self.max_frames:
             self.reset()
-            return data
-        return None
+            return [(self.frame_len, n * self.frame_len)]
+        return []
+
+    def process(self, f32: np.ndarray) -> int:
+        """
+        Single-frame form of process_block(). Returns the length in samples of
+        the chunk that ends with this frame, or 0 while the chunk is still open.
+        """
+        cuts = self.process_block(f32)
+        return cuts[-1][1] if cuts else 0
+
+class SpeechGate:
+    """
+    Second-stage check between the energy VAD and Whisper: scores a chunk with
+    the Silero VAD that ships with faster-whisper (ONNX, CPU, ~3 ms per second
+    of audio) and rejects chunks with less than `min_speech_ms` of windows at
+    or above `threshold` speech probability — coughs, keyboard, applause, music.
+    The model is loaded on first use; if loading or scoring fails (e.g. the
+    older Silero API of faster-whisper 1.0.x) the gate lets everything
+    through (`available` becomes False).
+    """
+    WINDOW = 512  # Silero 16 kHz 窗长
+
+    def __init__(self, threshold: float = 0.5, min_speech_ms: int = 250):
+        self.threshold = float(threshold)
+        self.min_windows = max(1, int(min_speech_ms * 16 // self.WINDOW))
+        self.available = True
+        self._model = None
+        self._lock = threading.Lock()  # 多个解码线程共用一个门
+        self.rejected = 0       # 被拦下的 chunk
+        self.rejected_s = 0.0   # 被拦下的音频秒数
+        self.cost_s = 0.0       # 打分本身花的时间
+
+    def accept(self, audio: np.ndarray) -> bool:
+        with self._lock:
+            return self._accept(audio)
+
+    def _accept(self, audio: np.ndarray) -> bool:
+        if not self.available:
+            return True
+        if self._model is None:
+            try:
+                from faster_whisper.vad import get_vad_model
+                self._model = get_vad_model()
+            except Exception:
+                self.available = False
+                return True
+        t = time.perf_counter()
+        n = len(audio) // self.WINDOW * self.WINDOW
+        try:
+            # 私有拷贝：Silero 会就地改写输入（上下文清零），不能把环形缓冲的视图交给它
+            probs = np.ravel(self._model(np.array(audio[:n], dtype=np.float32))) if n else np.zeros(0)
+        except Exception:
+            # faster-whisper 1.0.x 的 Silero 接口不同（要 state/sr）：关掉门，全部放行
+            self.available = False
+            return True
+        self.cost_s += time.perf_counter() - t
+        if int(np.count_nonzero(probs >= self.threshold)) >= self.min_windows:
+            return True
+        self.rejected += 1
+        self.rejected_s += len(audio) / 16000
+        return False
+
 
 def _norm_lang(code: str, *, for_target: bool = True) -> str:
     if not code:
@@ -68,199 +234,1292 @@ def _norm_lang(code: str, *, for_target: bool = True) -> str:
     return aliases.get(c, c)
 
 
+def parse_target_langs(langs) -> list:
+    """"ZH", "zh, ja,ES" or ["ZH", "JA"] -> normalized DeepL codes, first one primary, no duplicates."""
+    if isinstance(langs, str):
+        langs = langs.split(",")
+    out = []
+    for code in langs or ():
+        if code and code.strip() and _norm_lang(code) not in out:
+            out.append(_norm_lang(code))
+    return out or [_norm_lang("")]
+
+
+def deepl_api_base(auth_key: str) -> str:
+    # 免费版 key 以 ":fx" 结尾，走 api-free
+    return "https://api-free.deepl.com" if (auth_key or "").endswith(":fx") else "https://api.deepl.com"
+
+
+class CircuitBreaker:
+    """
+    Per-backend health: after `fail_threshold` consecutive failures the breaker
+    opens and allow() says no for `cooldown_s`; then one trial request is let
+    through (half-open) and its outcome closes or re-opens the breaker.
+    """
+    def __init__(self, name: str, fail_threshold: int = 3, cooldown_s: float = 30.0):
+        self.name = name
+        self.fail_threshold = max(1, int(fail_threshold))
+        self.cooldown_s = float(cooldown_s)
+        self._lock = threading.Lock()
+        self._fails = 0
+        self._open_until = 0.0
+        self._trial = False
+        self.opens = 0      # 打开次数
+        self.skipped = 0    # 因为打开而跳过的请求
+
+    @property
+    def state(self) -> str:
+        if self._fails < self.fail_threshold:
+            return "closed"
+        return "half-open" if time.monotonic() >= self._open_until else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._fails < self.fail_threshold:
+                return True
+            if time.monotonic() >= self._open_until and not self._trial:
+                self._trial = True  # 冷却结束：放一个试探请求
+                return True
+            self.skipped += 1
+            return False
+
+    def success(self):
+        with self._lock:
+            self._fails = 0
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self._fails += 1
+            if self._fails >= self.fail_threshold and (self._trial or self._fails == self.fail_threshold):
+                self.opens += 1
+                self._open_until = time.monotonic() + self.cooldown_s
+            self._trial = False
+
+
 class DeepLClient:
+    MYMEMORY_URL = "https://api.mymemory.translated.net/get"
+    DEEPL_TIMEOUT_S = 12.0
+    MYMEMORY_TIMEOUT_S = 8.0
+
     def __init__(self, auth_key: str, api_base: str = "https://api.deepl.com",
-                 target_lang: str = "ZH", source_lang: str = "EN"):
+                 target_lang: str = "ZH", source_lang: str = "EN", max_connections: int = 4,
+                 cache=None, budget_s: float = 0.0, breaker_failures: int = 3, breaker_cooldown_s: float = 30.0):
         self.key = auth_key
+        self.cache = cache  # TranslationCache 或 None
+        # 每次 translate_many 的时间预算（0 = 不限）；用掉一半还没结果就同时问 MyMemory
+        self.budget_s = float(budget_s)
+        self.breakers = {
+            "deepl": CircuitBreaker("deepl", breaker_failures, breaker_cooldown_s),
+            "mymemory": CircuitBreaker("mymemory", breaker_failures, breaker_cooldown_s),
+        }
+        # 计数：DeepL 请求/失败/超时、MyMemory 兜底次数及耗时、对冲/重试/超预算
+        self.deepl_calls = 0
+        self.deepl_errors = 0
+        self.deepl_timeouts = 0
+        self.fallback_calls = 0
+        self.fallback_errors = 0
+        self.fallback_s = 0.0
+        self.hedged = 0          # DeepL 还在途时提前发出的 MyMemory 请求批次
+        self.retries = 0         # DeepL 失败后改走 MyMemory 的批次
+        self.budget_exceeded = 0
         self.base = api_base.rstrip("/")
         self.lang = _norm_lang(target_lang, for_target=True)
         self.src  = _norm_lang(source_lang, for_target=False)
+        # 长连接池：复用 TLS 连接，并发翻译时每个线程各占一条
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(1, int(max_connections)) * 2)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # 对冲请求要并发发出，自带一个小线程池
+        self._io = ThreadPoolExecutor(max(2, int(max_connections) * 2), thread_name_prefix="translate-io")
+
+    def close(self):
+        self._io.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+    # DeepL 单次请求上限：最多 50 条 text，请求体 128 KiB；字符数留足余量
+    MAX_BATCH_TEXTS = 50
+    MAX_BATCH_CHARS = 30000
 
     def translate(self, text: str) -> str:
-        # 1) DeepL 主路
+        return self.translate_many([text])[0]
+
+    def translate_many(self, texts: list, context: str = "") -> list:
+        """
+        Translate many texts with as few DeepL requests as possible.
+        Returns one string per input, in order. Cached items are not sent.
+        `context` (e.g. the preceding sentence) is sent to DeepL to steer the
+        translation but is not translated itself.
+        Items DeepL fails on fall back to MyMemory; with a `budget_s`, MyMemory
+        is also asked (hedged) once half the budget is gone without an answer,
+        and whatever is still missing at the deadline becomes a
+        "[no-translation]" marker. Backends whose circuit breaker is open are
+        skipped.
+        """
+        deadline = time.monotonic() + self.budget_s if self.budget_s > 0 else None
+        out = [None] * len(texts)
+        if self.cache is not None:
+            for i, t in enumerate(texts):
+                out[i] = self.cache.get(t, self.src, self.lang)
+        todo = [i for i, t in enumerate(out) if t is None]
+        for idx in self._batches([texts[i] for i in todo]):
+            idx = [todo[j] for j in idx]
+            got = self._translate_batch([texts[i] for i in idx], deadline, context)
+            for i, t in zip(idx, got):
+                out[i] = t
+        for i in todo:
+            if out[i] is None:
+                # 最终兜底：直接显示原文并打标，避免 UI 下方空白
+                out[i] = f"[no-translation] {texts[i]}"
+            # 占位标记不进缓存，下次还要重试
+            elif self.cache is not None:
+                self.cache.put(texts[i], self.src, self.lang, out[i])
+        return out
+
+    def translate_sentence(self, texts: list, context: str = "") -> list:
+        """
+        Translate the fragments of one sentence as a single text (one request,
+        `context` as above) and split the result back into one piece per
+        fragment, in proportion to the fragments' lengths.
+        """
+        joined = " ".join(t.strip() for t in texts)
+        tgt = self.translate_many([joined], context)[0]
+        if tgt.startswith("[no-translation]"):
+            return [f"[no-translation] {t}" for t in texts]
+        return split_translation(tgt, [len(t.strip()) for t in texts])
+
+    def _batches(self, texts: list):
+        # 按条数和字符数切批，产出原始下标
+        idx, chars = [], 0
+        for i, t in enumerate(texts):
+            n = len(t or "")
+            if idx and (len(idx) >= self.MAX_BATCH_TEXTS or chars + n > self.MAX_BATCH_CHARS):
+                yield idx
+                idx, chars = [], 0
+            idx.append(i)
+            chars += n
+        if idx:
+            yield idx
+
+    def _translate_batch(self, texts: list, deadline, context: str = "") -> list:
+        """DeepL for the batch, MyMemory per text on failure / hedge; None where nothing arrived in time."""
+        out = [None] * len(texts)
+        t0 = time.monotonic()
+        hedge_at = t0 + (deadline - t0) / 2 if deadline else None
+        primary = None
+        if self.breakers["deepl"].allow():
+            primary = self._io.submit(self._deepl, texts, self._timeout(self.DEEPL_TIMEOUT_S, deadline), context)
+        backup = {}  # 下标 -> MyMemory future
+
+        def start_backup():
+            for i, t in enumerate(texts):
+                if out[i] is None and i not in backup and self.breakers["mymemory"].allow():
+                    backup[i] = self._io.submit(self._fallback, t, self._timeout(self.MYMEMORY_TIMEOUT_S, deadline))
+
+        if primary is None:
+            start_backup()
+        while True:
+            if primary is not None and primary.done():
+                got, primary = primary.result(), None
+                for i, t in enumerate(got):
+                    if t is not None:
+                        out[i] = t
+                if any(t is None for t in out):
+                    self.retries += 1
+                    start_backup()
+            for i, fut in list(backup.items()):
+                if fut.done():
+                    del backup[i]
+                    if out[i] is None:
+                        out[i] = fut.result()
+            pending = [f for f in [primary, *backup.values()] if f is not None]
+            if all(t is not None for t in out) or not pending:
+                return out
+            now = time.monotonic()
+            if deadline and now >= deadline:
+                self.budget_exceeded += 1
+                return out  # 剩下的请求继续跑完，只用来更新熔断器
+            if primary is not None and hedge_at and now >= hedge_at and not backup:
+                hedge_at = None
+                self.hedged += 1
+                start_backup()
+                continue
+            wake = [t for t in (hedge_at if primary is not None and not backup else None, deadline) if t]
+            futures_wait(pending, timeout=max(0.0, min(wake) - now) if wake else None, return_when=FIRST_COMPLETED)
+
+    @staticmethod
+    def _timeout(limit: float, deadline) -> float:
+        if not deadline:
+            return limit
+        return max(0.5, min(limit, deadline - time.monotonic()))
+
+    def _deepl(self, texts: list, timeout: float = DEEPL_TIMEOUT_S, context: str = "") -> list:
+        # 1) DeepL 主路；失败的条目返回 None，交给兜底
+        self.deepl_calls += 1
+        breaker = self.breakers["deepl"]
         try:
-            data = {
-                "auth_key": self.key,
-                "text": text,
-                "target_lang": self.lang,  # e.g. ZH / EN-US
-                "source_lang": self.src,  # e.g. EN
-                "split_sentences": "0",
-                "preserve_formatting": "1"
-            }
-            r = requests.post(f"{self.base}/v2/translate", data=data, timeout=12)
+            data = [
+                ("auth_key", self.key),
+                ("target_lang", self.lang),  # e.g. ZH / EN-US
+                ("source_lang", self.src),  # e.g. EN
+                ("split_sentences", "0"),
+                ("preserve_formatting", "1"),
+            ] + ([("context", context)] if context else []) + [("text", t) for t in texts]
+            r = self.session.post(f"{self.base}/v2/translate", data=data, timeout=timeout)
             r.raise_for_status()
             js = r.json()
-            out = js["translations"][0]["text"]
-            if isinstance(out, str) and out.strip():
-                return out
+            got = [tr.get("text") for tr in js.get("translations") or []]
+        except requests.Timeout:
+            self.deepl_errors += 1
+            self.deepl_timeouts += 1
+            breaker.failure()
+            return [None] * len(texts)
         except Exception:
-            pass
+            self.deepl_errors += 1
+            breaker.failure()
+            return [None] * len(texts)
+        breaker.success()
+        got += [None] * (len(texts) - len(got))
+        return [t if isinstance(t, str) and t.strip() else None for t in got[:len(texts)]]
 
-        # 2) 兜底：MyMemory
+    def _fallback(self, text: str, timeout: float = MYMEMORY_TIMEOUT_S):
+        # 2) 兜底：MyMemory；失败返回 None
+        self.fallback_calls += 1
+        breaker = self.breakers["mymemory"]
+        t0 = time.monotonic()
         try:
             src = (self.src or "EN").split("-")[0].lower()
             tgt = (self.lang or "ZH").split("-")[0].lower()
             tgt = "zh-CN" if tgt == "zh" else tgt
-            r = requests.get(
-                "https://api.mymemory.translated.net/get",
+            r = self.session.get(
+                self.MYMEMORY_URL,
                 params={"q": text, "langpair": f"{src}|{tgt}"},
-                timeout=8
+                timeout=timeout
             )
             js = r.json()
             out = (js.get("responseData") or {}).get("translatedText", "")
             if isinstance(out, str) and out.strip():
+                breaker.success()
                 return out
         except Exception:
             pass
+        finally:
+            self.fallback_s += time.monotonic() - t0
+        self.fallback_errors += 1
+        breaker.failure()
+        return None
+
+    def counters(self) -> dict:
+        d, m = self.breakers["deepl"], self.breakers["mymemory"]
+        return {
+            "deepl_calls": self.deepl_calls,
+            "deepl_errors": self.deepl_errors,
+            "deepl_timeouts": self.deepl_timeouts,
+            "fallback_calls": self.fallback_calls,
+            "fallback_errors": self.fallback_errors,
+            "fallback_s": round(self.fallback_s, 2),
+            "hedged": self.hedged,
+            "retries": self.retries,
+            "budget_exceeded": self.budget_exceeded,
+            "deepl_breaker": d.state, "deepl_breaker_opens": d.opens, "deepl_breaker_skips": d.skipped,
+            "mymemory_breaker": m.state, "mymemory_breaker_opens": m.opens, "mymemory_breaker_skips": m.skipped,
+        }
+
+
+class TranslationPool:
+    """
+    Runs translate_many() for caption batches (one batch per VAD chunk)
+    concurrently but hands captions back in submission order, so output_q
+    always sees them in spoken order.
+    """
+    def __init__(self, translate_many, max_workers: int = 4):
+        self.max_workers = max(1, int(max_workers))
+        self.max_in_flight = self.max_workers * 2
+        self._translate_many = translate_many
+        self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="translate")
+        self._pending = collections.deque()
+
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    def _run(self, fn, texts: list):
+        t0 = time.monotonic()
+        out = fn(texts)
+        return t0, time.monotonic(), out
+
+    def submit(self, captions: list, translate: bool = True, fn=None):
+        # fn(texts) -> tgts 替换默认的 translate_many（例如整句翻译后再拆回）
+        if captions:
+            texts = [c["src"] for c in captions]
+            if translate:
+                fut = self._pool.submit(self._run, fn or self._translate_many, texts)
+            else:
+                # 降级：不翻译，但仍按顺序排在在途批次后面交付
+                fut = Future()
+                fut.set_result((None, None, [""] * len(texts)))
+            self._pending.append((captions, fut))
+
+    def pop_ready(self, timeout: float = 0.0) -> list:
+        # 只交付队首连续完成的部分；队首没好就最多等 timeout 秒
+        if self._pending and timeout > 0:
+            futures_wait([self._pending[0][1]], timeout=timeout)
+        out = []
+        while self._pending and self._pending[0][1].done():
+            captions, fut = self._pending.popleft()
+            try:
+                t0, t1, tgts = fut.result()
+            except Exception:
+                t0 = t1 = None
+                tgts = [f"[no-translation] {c['src']}" for c in captions]
+            for cap, tgt in zip(captions, tgts):
+                cap["tgt"] = tgt
+                if t0 is not None and "t" in cap:
+                    cap["t"]["tr_start"] = t0
+                    cap["t"]["tr_end"] = t1
+                out.append(cap)
+        return out
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pending.clear()
+
+
+_SPLIT_AFTER = frozenset(" ,.;:!?，。、；：！？…")
+
+
+def split_translation(text: str, weights: list) -> list:
+    """
+    Cut `text` into len(weights) consecutive pieces whose lengths follow
+    `weights`, moving each cut to a nearby space or punctuation mark when
+    there is one (CJK text without one is cut at the proportional point).
+    """
+    n = len(weights)
+    if n <= 1:
+        return [text]
+    w = [max(1, int(x)) for x in weights]
+    total, L = sum(w), len(text)
+    cuts, acc, prev = [], 0, 0
+    for k in range(n - 1):
+        acc += w[k]
+        ideal = round(L * acc / total)
+        # 每段至少留一个字；在理想位置附近（该段长度的 1/3 内）找断点
+        lo, hi = min(prev + 1, L), max(min(prev + 1, L), L - (n - 1 - k))
+        win = max(2, L * w[k] // total // 3)
+        cut = None
+        for d in range(win + 1):
+            for c in (ideal + d, ideal - d):
+                if lo <= c <= hi and text[c - 1] in _SPLIT_AFTER:
+                    cut = c
+                    break
+            if cut is not None:
+                break
+        prev = min(max(cut if cut is not None else ideal, lo), hi)
+        cuts.append(prev)
+    return [text[a:b].strip() for a, b in zip([0] + cuts, cuts + [L])]
+
+
+class SentenceCoalescer:
+    """
+    Holds caption fragments across VAD chunks until they finish a sentence, so a
+    sentence Whisper/group_captions cut into pieces is translated as one text.
+    A group is released when its last fragment ends with sentence punctuation,
+    when its first fragment has waited `max_delay_s`, or once it holds
+    `max_chars`. Each released group comes with up to `context_chars` of the
+    source text before it, to pass to the translator as context.
+    `now` is any clock the caller uses consistently (monotonic or audio time).
+    Captions with different "speaker" labels are buffered (and given context)
+    separately, so sentences of two inputs never end up in one group.
+    """
+    SENTENCE_END = (".", "!", "?", "…", "。", "！", "？")
+    CLOSERS = "\"')]”’»"
+
+    def __init__(self, max_delay_s: float = 2.5, max_chars: int = 400, context_chars: int = 300):
+        self.max_delay = float(max_delay_s)
+        self.max_chars = int(max_chars)
+        self.context_chars = int(context_chars)
+        self._bufs = {}      # speaker -> [小句列表, 第一句进来的时间, 前文]
+        self.groups = 0      # 放出的组数（≈ 翻译请求数）
+        self.fragments = 0   # 其中的小句数
+
+    @property
+    def pending(self) -> int:
+        return sum(len(b[0]) for b in self._bufs.values())
+
+    def _release(self, b: list) -> tuple:
+        group, ctx = b[0], b[2]
+        b[0], b[1] = [], None
+        b[2] = (ctx + " " + " ".join(c["src"] for c in group)).strip()[-self.context_chars:]
+        self.groups += 1
+        self.fragments += len(group)
+        return group, ctx
+
+    def add(self, captions: list, now: float) -> list:
+        """Buffer `captions`; returns the [(captions, context)] groups that are complete."""
+        out = []
+        for cap in captions:
+            b = self._bufs.setdefault(cap.get("speaker"), [[], None, ""])
+            if not b[0]:
+                b[1] = now
+            b[0].append(cap)
+            src = cap["src"].rstrip().rstrip(self.CLOSERS)
+            if src.endswith(self.SENTENCE_END) or sum(len(c["src"]) for c in b[0]) >= self.max_chars:
+                out.append(self._release(b))
+        return out + self.due(now)
+
+    def due(self, now: float) -> list:
+        """The held groups that have waited `max_delay_s`."""
+        return [self._release(b) for b in self._bufs.values() if b[0] and now - b[1] >= self.max_delay]
+
+    def wait_s(self, now: float):
+        """Seconds until the next held group is due (None when nothing is held)."""
+        since = [b[1] for b in self._bufs.values() if b[0]]
+        return None if not since else max(0.0, min(since) + self.max_delay - now)
+
+    def flush(self) -> list:
+        return [self._release(b) for b in self._bufs.values() if b[0]]
+
+
+class StageQueue:
+    """
+    Bounded hand-off queue between two pipeline stages.
+    When full, `policy` decides what happens to a new item:
+      block       - wait for room (explicit backpressure on the producer)
+      drop_oldest - evict the oldest queued item
+      drop_newest - discard the new item
+      merge       - fold the new item into the newest queued one via `merge(a, b)`;
+                    falls back to drop_oldest when merge returns None
+    """
+    POLICIES = ("block", "drop_oldest", "drop_newest", "merge")
+
+    def __init__(self, maxsize: int, policy: str = "drop_oldest", merge=None, name: str = "", cv=None):
+        self.maxsize = max(1, int(maxsize))
+        self.policy = policy if policy in self.POLICIES else "drop_oldest"
+        self.name = name
+        self._merge = merge
+        self._dq = collections.deque()
+        self._cv = cv or threading.Condition()  # FairScheduler 让几个队列共用一个
+        self.dropped = 0
+        self.merged = 0
+
+    def put(self, item, timeout=None) -> bool:
+        with self._cv:
+            if len(self._dq) >= self.maxsize:
+                if self.policy == "block":
+                    if not self._cv.wait_for(lambda: len(self._dq) < self.maxsize, timeout):
+                        self.dropped += 1
+                        return False
+                elif self.policy == "drop_newest":
+                    self.dropped += 1
+                    return False
+                else:
+                    folded = self._merge(self._dq[-1], item) if (self.policy == "merge" and self._merge) else None
+                    if folded is not None:
+                        self._dq[-1] = folded
+                        self.merged += 1
+                        self._cv.notify_all()
+                        return True
+                    self._dq.popleft()
+                    self.dropped += 1
+            self._dq.append(item)
+            self._cv.notify_all()
+            return True
 
-        # 3) 最终兜底：直接显示原文并打标，避免 UI 下方空白
-        return f"[no-translation] {text}"
+    def get(self, timeout=None):
+        with self._cv:
+            if not self._cv.wait_for(lambda: len(self._dq) > 0, timeout):
+                raise queue.Empty
+            item = self._dq.popleft()
+            self._cv.notify_all()
+            return item
+
+    def qsize(self) -> int:
+        with self._cv:
+            return len(self._dq)
+
+    def peek(self):
+        with self._cv:
+            return self._dq[0] if self._dq else None
+
+
+class FairScheduler:
+    """
+    Chunk queue in front of the decoder threads when a session has several
+    inputs. Each input keeps its own bounded StageQueue (same overflow policy
+    as before); get() hands out the queued chunk with the earliest deadline —
+    end of its audio plus that input's latency target — so a speaker who
+    talks a lot cannot starve a quiet one, and an input with a tighter target
+    is served first. Ties go round-robin. Returns (input index, chunk); an
+    input is not handed out again until release(i), so each input's chunks
+    are decoded one at a time and in order while several decoder threads
+    work on different inputs.
+    """
+    def __init__(self, n: int, maxsize: int, policy: str = "merge", merge=None, targets_s=(3.0,)):
+        self._cv = threading.Condition()
+        self.queues = [StageQueue(maxsize, policy, merge, name=f"chunk{i}", cv=self._cv) for i in range(n)]
+        self.targets = [float(targets_s[min(i, len(targets_s) - 1)]) for i in range(n)]
+        self._next = 0
+        self._busy = set()
+        self.served = [0] * n  # 每路送去解码的 chunk
+        self.late = [0] * n    # 开始解码时已过截止时间的 chunk
+
+    def put(self, i: int, item, timeout=None) -> bool:
+        return self.queues[i].put(item, timeout)
+
+    def get(self, timeout=None):
+        with self._cv:
+            ready = lambda: any(q._dq and i not in self._busy for i, q in enumerate(self.queues))
+            if not self._cv.wait_for(ready, timeout):
+                raise queue.Empty
+            n, best = len(self.queues), None
+            for k in range(n):
+                i = (self._next + k) % n
+                head = None if i in self._busy else self.queues[i].peek()
+                # chunk = (pos0, pos1, start_mono, end_mono, t_vad)
+                if head is not None and (best is None or head[3] + self.targets[i] < best[0]):
+                    best = (head[3] + self.targets[i], i)
+            deadline, i = best
+            item = self.queues[i].get(timeout=0)
+            self._busy.add(i)
+            self._next = (i + 1) % n
+            self.served[i] += 1
+            if time.monotonic() > deadline:
+                self.late[i] += 1
+            return i, item
+
+    def release(self, i: int):
+        with self._cv:
+            self._busy.discard(i)
+            self._cv.notify_all()
+
+    def qsize(self) -> int:
+        return sum(q.qsize() for q in self.queues)
+
+    @property
+    def dropped(self) -> int:
+        return sum(q.dropped for q in self.queues)
+
+    @property
+    def merged(self) -> int:
+        return sum(q.merged for q in self.queues)
+
+
+# 合并后的 chunk 上限（秒），再长就宁可丢最旧的，避免 Whisper 一次吃太大
+MAX_MERGED_CHUNK_S = 30.0
+
+
+class ChunkController:
+    """
+    Retunes the VAD's minimum chunk length and silence cut-off at runtime from
+    the measured decode speed. Keeps an EWMA of the real-time factor
+    (decode time / audio time) of each final transcribe() call; every
+    `interval_s` it lengthens chunks when decoding is slow (RTF > `high`) or
+    chunks are queuing up, and shortens them again when the decoder is idle
+    (RTF < `low`, no backlog). Longer chunks amortize Whisper's fixed per-call
+    cost; shorter ones give lower latency. The silence cut-off moves in step
+    with the chunk length, both within the user-set (low, high) bounds.
+    """
+    high, low = 0.6, 0.3
+
+    def __init__(self, vad: EnergyVadChunker, chunk_ms=(600, 2400), sil_ms=(350, 700),
+                 alpha: float = 0.3, interval_s: float = 2.0):
+        self.vad = vad
+        self.chunk_lo, self.chunk_hi = chunk_ms[0], max(chunk_ms)
+        self.sil_lo, self.sil_hi = sil_ms[0], max(sil_ms)
+        self.alpha = float(alpha)
+        self.interval = float(interval_s)
+        self.rtf = None
+        self.chunk_ms = float(self.chunk_lo)
+        self.sil_ms = float(self.sil_lo)
+        self.changes = 0
+        self._next = 0.0
+
+    def observe(self, audio_s: float, decode_s: float, backlog: int) -> bool:
+        """Record one decode; returns True when the VAD limits were changed."""
+        r = decode_s / max(audio_s, 1e-3)
+        self.rtf = r if self.rtf is None else self.alpha * r + (1.0 - self.alpha) * self.rtf
+        now = time.monotonic()
+        if now < self._next:
+            return False
+        self._next = now + self.interval
+        if backlog > 0 or self.rtf > self.high:
+            scale = 1.25 + 0.1 * min(backlog, 5)  # 积压越多放得越快
+        elif self.rtf < self.low:
+            scale = 0.9
+        else:
+            return False
+        chunk = float(min(self.chunk_hi, max(self.chunk_lo, self.chunk_ms * scale)))
+        if abs(chunk - self.chunk_ms) < 1.0:
+            return False
+        self.chunk_ms = chunk
+        span = self.chunk_hi - self.chunk_lo
+        frac = (chunk - self.chunk_lo) / span if span else 0.0
+        self.sil_ms = self.sil_lo + frac * (self.sil_hi - self.sil_lo)
+        self.vad.set_limits(int(self.chunk_ms), int(self.sil_ms))
+        self.changes += 1
+        return True
+
+
+class LoadShedder:
+    """
+    Keeps captions live when the machine cannot keep up. `lag` is how long ago
+    a chunk's audio ended when it reaches a stage:
+      - lag > stale_s at decode: the chunk is discarded
+      - lag > skip_translate_s at translation: captions go out source-only
+        (partial re-decodes are skipped too while the decoder is that far behind)
+      - lag > fallback_s at decode: switch to the smaller fallback model until
+        lag stays below recover_s for recover_hold_s
+    A threshold of 0 disables that rule.
+    """
+    def __init__(self, stale_s=20.0, skip_translate_s=8.0, fallback_s=12.0, recover_s=2.0, recover_hold_s=30.0):
+        self.stale_s = float(stale_s)
+        self.skip_translate_s = float(skip_translate_s)
+        self.fallback_s = float(fallback_s)
+        self.recover_s = float(recover_s)
+        self.recover_hold_s = float(recover_hold_s)
+        self.lag = 0.0             # 最近一次解码时的滞后
+        self.fallback_active = False
+        self._calm_since = None
+        self.stale = 0             # 过期丢弃的 chunk
+        self.untranslated = 0      # 降级为只显示原文的字幕
+        self.switches = 0          # 主模型 <-> 备用模型切换次数
+
+    @property
+    def overloaded(self) -> bool:
+        return bool(self.skip_translate_s) and self.lag > self.skip_translate_s
+
+    def drop_stale(self, lag: float) -> bool:
+        self.lag = lag
+        if self.stale_s and lag > self.stale_s:
+            self.stale += 1
+            return True
+        return False
+
+    def use_fallback(self, lag: float) -> bool:
+        if not self.fallback_s:
+            return False
+        if not self.fallback_active:
+            if lag > self.fallback_s:
+                self.fallback_active = True
+                self.switches += 1
+                self._calm_since = None
+        elif lag < self.recover_s:
+            # 迟滞：持续跟上一段时间才切回主模型
+            now = time.monotonic()
+            if self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= self.recover_hold_s:
+                self.fallback_active = False
+                self.switches += 1
+        else:
+            self._calm_since = None
+        return self.fallback_active
+
+    def skip_translation(self, captions: list) -> bool:
+        if not (self.skip_translate_s and captions):
+            return False
+        t = captions[0].get("t") or {}
+        if time.monotonic() - t.get("capture", time.monotonic()) > self.skip_translate_s:
+            self.untranslated += len(captions)
+            return True
+        return False
+
+
+# 字幕 id 在进程内全局递增：Stop 后马上再开的会话不会和上一会话残留的结果撞号
+_caption_ids = itertools.count(1)
+
+
+def _merge_chunks(a, b):
+    # chunk 是环形缓冲里的 [pos0, pos1) 区间，VAD 切出来的首尾相接，合并只需扩展区间
+    pos0, _, start_a, _, _ = a
+    _, pos1, _, end_b, t_vad = b
+    if (pos1 - pos0) / 16000 > MAX_MERGED_CHUNK_S:
+        return None
+    return (pos0, pos1, start_a, end_b, t_vad)
+
+
+def _merge_captions(a, b):
+    # 同样设上限：合并后跨度太长就不再合并，退化为 drop_oldest，队列里的条目不会无限变长
+    if a and b and b[-1]["end"] - a[0]["start"] > MAX_MERGED_CHUNK_S:
+        return None
+    return a + b
+
+
+def _agree_word(w: str) -> str:
+    return w.strip(".,!?;:\"'").lower()
+
+
+def local_agreement(prev: list, cur: list, committed: int) -> int:
+    """
+    LocalAgreement: words are committed once two consecutive hypotheses agree
+    on them. Returns the new committed word count (never below `committed`).
+    """
+    n = committed
+    while n < len(prev) and n < len(cur) and _agree_word(prev[n]) == _agree_word(cur[n]):
+        n += 1
+    return n
+
+
+def group_captions(segments, t0: float = 0.0) -> list:
+    """
+    将一个 chunk 的识别结果做成多条“词组/小句”字幕：
+    - 如果有 word_timestamps，就按词的时间做分组，并精确到每组的起止时间
+    - 没有的话，退化为按 segment 的起止时间
+    t0 是 chunk 开头对应的时间；返回 [{"src", "start", "end", "words"}]，
+    "words" 只在有逐词时间时出现：[{"w", "start", "end", "p"}]。
+    """
+    # 分组阈值：同一小句最多多少词、相邻词间最大间隔（秒）、句末标点断句
+    MAX_WORDS = 8
+    MAX_GAP_S = 0.5
+    PUNC_BREAKS = {".", "!", "?", ",", ";", ":", "。", "！", "？", "，", "；", "："}
+
+    captions = []
+
+    def flush_group(group):
+        if not group:
+            return
+        # 组文本与时间（相对 chunk 开头），再换算成绝对单调时钟
+        text = "".join(w.word for w in group).strip()
+        text = " ".join(text.split())  # 规整空格
+        gstart = group[0].start or 0.0
+        gend = group[-1].end or gstart
+        abs_start = t0 + float(gstart)
+        abs_end = t0 + float(gend)
+
+        if text:
+            captions.append({
+                "src": text,
+                "start": abs_start,
+                "end": abs_end,
+                # 逐词时间（绝对时钟），JSONL 输出原样保留
+                "words": [{"w": (w.word or "").strip(), "start": t0 + float(w.start or gstart),
+                           "end": t0 + float(w.end or w.start or gend), "p": getattr(w, "probability", None)}
+                          for w in group]
+            })
+        group.clear()
+
+    used_word_level = False
+    for s in segments:
+        words = getattr(s, "words", None) or []
+        if words:
+            used_word_level = True
+            group = []
+            prev_end = None
+            for w in words:
+                token = (w.word or "").strip()
+                group.append(w)
+                # 断句条件：到上限、遇到句末标点、词间隔太大
+                end_with_punc = token in PUNC_BREAKS or (token and token[-1] in PUNC_BREAKS)
+                reach_limit = len(group) >= MAX_WORDS
+                gap_break = (prev_end is not None) and ((w.start or 0.0) - prev_end > MAX_GAP_S)
+                if end_with_punc or reach_limit or gap_break:
+                    flush_group(group)
+                prev_end = w.end or w.start or prev_end
+            # 收尾
+            flush_group(group)
+
+    # 如果模型/包不返回逐词时间，则退化到按 segment 输出（仍使用准确的 segment 起止）
+    if not used_word_level:
+        for s in segments:
+            txt = (s.text or "").strip()
+            if not txt:
+                continue
+            seg_start = float(getattr(s, "start", 0.0) or 0.0)
+            seg_end = float(getattr(s, "end", seg_start))
+            captions.append({
+                "src": txt,
+                "start": t0 + seg_start,
+                "end": t0 + seg_end
+            })
+
+    return captions
+
+
+class AudioInput:
+    """
+    One capture input of an AsrEngine session (a microphone, or one channel of
+    a multi-channel interface): its AudioSource, ring buffer, VAD (plus
+    ChunkController when adaptive), the speaker label its captions carry and
+    the latency target the FairScheduler uses for its chunks.
+    """
+    def __init__(self, index: int, source, label: str, vad: EnergyVadChunker, ring_samples: int,
+                 latency_s: float = 3.0, controller=None):
+        self.index = index
+        self.source = source
+        self.label = label
+        self.vad = vad
+        self.controller = controller
+        self.latency_s = float(latency_s)
+        self.ring = AudioRing(ring_samples)
+        self.ready = threading.Event()
+        self.vad_pos = 0       # VAD 已处理到的环形缓冲位置
+        self.final_pos = 0     # 已定稿（或丢弃）到的位置
+        self.done = threading.Event()  # 有限音源全部切完
+
+    def on_audio(self, block: np.ndarray):
+        # AudioSource 回调：只做一次拷贝进环形缓冲，不阻塞
+        self.ring.write(block)
+        self.ready.set()
 
 
 class AsrEngine(threading.Thread):
     """
-    Runs mic capture + VAD chunking + Whisper + DeepL.
+    Runs audio capture + VAD chunking + Whisper + DeepL as a staged pipeline:
+      capture -> VAD -> chunk_q -> ASR worker(s) -> caption_q -> translation -> output_q
     Pushes dict items into output_q:
-      {"src": str, "tgt": str, "start": float, "end": float}
-    start/end are session-relative monotonic seconds.
+      {"src", "tgt", "lang", "start", "end", "utt_end", "t", "words", "id"[, "speaker", "shed"]}
+      {"type": "source", "id", "src", ...}   原文先行：同 id 的译文稍后到达（每种语言一条）
+      {"type": "partial", "utt", "stable", "unstable", "start", "end"}   流式中间结果
+    start/end are session-relative monotonic seconds; "t" holds the per-stage
+    timestamps listed in metrics.TIMESTAMPS (the UI adds "render").
     """
     def __init__(self, output_q: "queue.Queue", deepl_key: str, target_lang: str,
                  model_name="base.en", device="cpu", compute_type="int8",
                  min_chunk_ms=600, max_sil_ms=350, vad_thresh_mult=2.5,
-                 api_base="https://api.deepl.com"):
+                 api_base="https://api.deepl.com",
+                 chunk_queue_size=4, caption_queue_size=32, overflow_policy="merge",
+                 translate_workers=4, translation_cache=None, ring_seconds=120,
+                 streaming=False, partial_interval_ms=500, model=None, source=None,
+                 adaptive_chunking=False, max_chunk_ms=2400, max_sil_ms_max=700,
+                 load_shedding=True, stale_deadline_s=20.0, skip_translate_lag_s=8.0,
+                 fallback_model="", fallback_lag_s=12.0, recover_lag_s=2.0, recover_hold_s=30.0,
+                 speech_gate=False, speech_gate_threshold=0.5, speech_gate_min_ms=250,
+                 translate_budget_s=0.0, breaker_failures=3, breaker_cooldown_s=30.0,
+                 source_first=False, coalesce_sentences=False, coalesce_max_delay_s=2.5,
+                 input_labels=None, latency_targets_s=3.0, asr_workers=1):
+        """
+        source: AudioSource, or a list of them (one per speaker; captions get
+            "speaker" from input_labels, default "Mic 1", "Mic 2", ...).
+        model: preloaded WhisperModel-like object; default: model_cache.
+        target_lang: one language or several ("ZH,JA,ES"); transcribed once,
+            translated into each concurrently.
+        overflow_policy: what full stage queues do (see StageQueue); capture and
+            VAD never wait.
+        translate_budget_s / breaker_*: per-batch deadline with MyMemory hedged
+            in at half of it; circuit breakers skip a failing backend.
+        coalesce_sentences: translate whole sentences across chunks, holding
+            fragments up to coalesce_max_delay_s (SentenceCoalescer).
+        load_shedding: drop chunks older than stale_deadline_s, go source-only
+            beyond skip_translate_lag_s, use fallback_model beyond fallback_lag_s.
+        speech_gate: score chunks with Silero first (SpeechGate).
+        adaptive_chunking: ChunkController moves the VAD limits up to
+            max_chunk_ms / max_sil_ms_max with the decode speed.
+        source_first: push "source" items before translation.
+        streaming: re-decode the open utterance every partial_interval_ms
+            (single input only).
+        latency_targets_s / asr_workers: FairScheduler deadlines (one value or
+            one per input) and decoder threads; load the model with
+            num_workers >= asr_workers.
+        """
         super().__init__(daemon=True)
         self.output_q = output_q
         self.sr = 16000
         self.frame_ms = 20
         self.frame_len = self.sr * self.frame_ms // 1000
-        self.vad = EnergyVadChunker(self.sr, self.frame_ms, min_chunk_ms, max_sil_ms, vad_thresh_mult)
         self._stop = threading.Event()
-        self.q = queue.Queue(maxsize=4000)
-        self.model = WhisperModel(model_name, device=device, compute_type=compute_type)
-        # warm up
-        list(self.model.transcribe(np.zeros(self.sr, dtype=np.float32), beam_size=1, language="en"))
-        self.translator = DeepLClient(
-            deepl_key, api_base=api_base,
-            target_lang=target_lang,
-            source_lang="EN"
-        )
+        # 每路输入各自的环形缓冲 + VAD；采集回调直接写入 float32 环形缓冲，VAD 和 Whisper 都只拿它的视图
+        sources = list(source) if isinstance(source, (list, tuple)) else [source if source is not None else DeviceSource()]
+        labels = list(input_labels or [])
+        targets = list(latency_targets_s) if isinstance(latency_targets_s, (list, tuple)) else [latency_targets_s]
+        self.inputs = []
+        for i, src in enumerate(sources):
+            vad = EnergyVadChunker(self.sr, self.frame_ms, min_chunk_ms, max_sil_ms, vad_thresh_mult)
+            # 自适应：按实测解码速度在 [min_chunk_ms, max_chunk_ms] / [max_sil_ms, max_sil_ms_max] 内调 VAD
+            controller = ChunkController(
+                vad, (min_chunk_ms, max(min_chunk_ms, max_chunk_ms)), (max_sil_ms, max(max_sil_ms, max_sil_ms_max))
+            ) if adaptive_chunking else None
+            label = labels[i] if i < len(labels) and labels[i] else (f"Mic {i + 1}" if len(sources) > 1 else "")
+            self.inputs.append(AudioInput(i, src, label, vad, self.sr * int(ring_seconds),
+                                          targets[min(i, len(targets) - 1)], controller))
+        # 单路时的旧名字
+        inp0 = self.inputs[0]
+        self.vad, self.controller, self.ring, self.source = inp0.vad, inp0.controller, inp0.ring, inp0.source
+        self.capture_done = threading.Event()  # 有限音源（文件/stdin）全部切完
+        self.overruns = 0       # VAD 跟不上、环形缓冲被追尾的次数
+        self.stale_chunks = 0   # 等到解码时音频已被覆盖而丢弃的 chunk
+        self.asr_errors = 0     # 解码抛异常而丢掉的请求
+        # 各级之间的有界队列：VAD -> ASR -> 翻译；多路输入的 chunk 由 FairScheduler 按截止时间交错
+        # 采集/VAD 线程从不等待：chunk 队列上的 block 按 drop_newest 处理（block 只作用于 caption 队列）
+        chunk_policy = "drop_newest" if overflow_policy == "block" else overflow_policy
+        self.chunk_q = FairScheduler(len(self.inputs), chunk_queue_size, chunk_policy, _merge_chunks,
+                                     [inp.latency_s for inp in self.inputs])
+        self.caption_q = StageQueue(caption_queue_size, overflow_policy, merge=_merge_captions, name="caption")
+        self.asr_workers = max(1, int(asr_workers))
+        # 流式：只保留最新一次中间结果请求；定稿 chunk 永远优先（只支持单路输入）
+        self.streaming = bool(streaming) and len(self.inputs) == 1
+        self.partial_interval = max(100, int(partial_interval_ms)) / 1000.0
+        self.partial_q = StageQueue(1, "drop_oldest", name="partial")
+        self._hyp = {"utt": None, "prev": [], "stable": []}
+        # 原文先行：每条字幕一个稳定 id，先发原文，译文作为同 id 的定稿随后到达
+        self.source_first = bool(source_first)
+        self._lock = threading.Lock()  # 多个解码线程：id 分配 + 入队保持同序，以及解码统计
+        # 模型走进程级缓存：重复 Start/Stop 不再重新加载
+        self.model = model if model is not None else get_model(model_name, device, compute_type)
+        # 能量 VAD 之后再用 Silero 过一遍，非语音 chunk 不送 Whisper
+        self.gate = SpeechGate(speech_gate_threshold, speech_gate_min_ms) if speech_gate else None
+        self.decode_s = 0.0         # 定稿解码累计耗时 / 对应音频秒数，用来估算省下的时间
+        self.decoded_audio_s = 0.0
+        # fallback_model：模型名（需要时后台加载）或现成的模型对象
+        self._fallback = None
+        self._fallback_spec = ""
+        if isinstance(fallback_model, str):
+            self._fallback_spec = fallback_model if fallback_model != model_name else ""
+        else:
+            self._fallback = fallback_model
+        self._fallback_loading = False
+        self._device, self._compute_type = device, compute_type
+        # 过载保护：过期丢弃 / 只出原文 / 切小模型
+        has_fallback = bool(self._fallback_spec) or self._fallback is not None
+        self.shedder = LoadShedder(
+            stale_deadline_s, skip_translate_lag_s, fallback_lag_s if has_fallback else 0.0,
+            recover_lag_s, recover_hold_s
+        ) if load_shedding else None
+        # 多目标语言：识别一次，每种语言各自一个客户端 + 有序翻译池；第一个是主语言
+        self.langs = parse_target_langs(target_lang)
+        self.translators, self.pools = {}, {}
+        for lang in self.langs:
+            tr = DeepLClient(
+                deepl_key, api_base=api_base,
+                target_lang=lang,
+                source_lang="EN",
+                max_connections=translate_workers,
+                cache=translation_cache,
+                budget_s=translate_budget_s,
+                breaker_failures=breaker_failures,
+                breaker_cooldown_s=breaker_cooldown_s
+            )
+            self.translators[lang] = tr
+            self.pools[lang] = TranslationPool(tr.translate_many, translate_workers)
+        self.translator = self.translators[self.langs[0]]
+        self.translation_pool = self.pools[self.langs[0]]
+        # 跨 chunk 攒成整句再翻译（带上文），按原来的小句拆回
+        self.coalescer = SentenceCoalescer(coalesce_max_delay_s) if coalesce_sentences else None
         self.session_start = time.monotonic()
 
     def stop(self):
         self._stop.set()
 
-    def _audio_cb(self, indata, frames, time_info, status):
-        pcm16 = (np.clip(indata[:,0], -1.0, 1.0) * 32768.0).astype(np.int16).tobytes()
-        self.q.put(pcm16)
+    def queue_depths(self) -> dict:
+        return {
+            "capture_ms": max(inp.ring.write_pos - inp.vad_pos for inp in self.inputs) * 1000 // self.sr,
+            "chunk_q": self.chunk_q.qsize(),
+            "caption_q": self.caption_q.qsize(),
+            "translating": self.in_flight(),
+            **({"coalescing": self.coalescer.pending} if self.coalescer else {}),
+        }
+
+    def in_flight(self) -> int:
+        return sum(p.in_flight() for p in self.pools.values())
+
+    def counters(self) -> dict:
+        tr = self.translator
+        return {
+            "overruns": self.overruns,
+            "stale_chunks": self.stale_chunks,
+            "chunks_dropped": self.chunk_q.dropped,
+            "chunks_merged": self.chunk_q.merged,
+            "captions_dropped": self.caption_q.dropped,
+            **tr.counters(),
+            # 其他目标语言只报请求数/失败数
+            **{f"{k}_{lang.lower()}": v for lang, t in list(self.translators.items())[1:]
+               for k, v in t.counters().items() if k in ("deepl_calls", "deepl_errors", "fallback_calls")},
+            # 独立进程推理时 watchdog 的统计
+            "asr_restarts": getattr(self.model, "restarts", 0),
+            "asr_lost": getattr(self.model, "lost_requests", 0) + self.asr_errors,
+            **({"lag_s": round(self.shedder.lag, 1), "shed_stale": self.shedder.stale,
+                "shed_untranslated": self.shedder.untranslated,
+                "fallback_active": int(self.shedder.fallback_active and self._fallback is not None)}
+               if self.shedder else {}),
+            **({"coalesced_groups": self.coalescer.groups, "coalesced_fragments": self.coalescer.fragments}
+               if self.coalescer else {}),
+            **({"gate_rejected": self.gate.rejected, "gate_saved_s": round(self.gate_saved_s(), 1)}
+               if self.gate else {}),
+            **({"rtf": round(self.controller.rtf or 0.0, 2), "chunk_ms": int(self.controller.chunk_ms),
+                "sil_ms": int(self.controller.sil_ms)} if self.controller else {}),
+            # 多路输入：每路送去解码的 chunk 数和其中超过延迟目标的
+            **({f"served_{inp.label}": self.chunk_q.served[inp.index] for inp in self.inputs} if len(self.inputs) > 1 else {}),
+            **({f"late_{inp.label}": self.chunk_q.late[inp.index] for inp in self.inputs} if len(self.inputs) > 1 else {}),
+        }
+
+    def gate_saved_s(self) -> float:
+        # 拦下的音频 × 实测每秒音频的解码耗时，减去打分本身的开销
+        if not self.gate or not self.decoded_audio_s:
+            return 0.0
+        return self.gate.rejected_s * self.decode_s / self.decoded_audio_s - self.gate.cost_s
+
+    def _wait_ready(self, inp: AudioInput):
+        # 非实时音源（文件快放）的背压：等 VAD 消化完、ASR 手上没有积压再喂下一块
+        while (inp.vad_pos < inp.ring.write_pos or self.chunk_q.qsize() > 0) and not self._stop.is_set():
+            time.sleep(0.005)
 
-    def _audio_loop(self):
-        with sd.InputStream(samplerate=self.sr, channels=1, dtype="float32",
-                            callback=self._audio_cb, blocksize=self.frame_len):
-            bsize = self.frame_len * 2
-            buf = b""
+    def _audio_loop(self, inp: AudioInput):
+        ring, vad = inp.ring, inp.vad
+        pos = inp.vad_pos = ring.write_pos  # 先记下起点，再开流，开头的音频不会漏掉
+        last_partial = 0.0
+        inp.source.start(inp.on_audio, lambda: self._wait_ready(inp))
+        try:
             while not self._stop.is_set():
+                if not inp.ready.wait(timeout=0.3):
+                    if inp.source.finished.is_set() and ring.write_pos - pos < self.frame_len:
+                        self._flush_vad(inp, pos)
+                        break
+                    continue
+                inp.ready.clear()
+                if not ring.valid(pos):
+                    # 被追尾：跳到最新位置，半截 chunk 作废
+                    self.overruns += 1
+                    pos = inp.vad_pos = ring.write_pos
+                    vad.reset()
+                # 一次处理所有已到达的整帧
+                head = ring.write_pos
+                now = time.monotonic()
+                k = min(head - pos, ring.capacity) // self.frame_len
+                if not k:
+                    continue
+                block_end = pos + k * self.frame_len
+                for end, n in vad.process_block(ring.view(pos, block_end)):
+                    pos1 = pos + end
+                    end_mono = now - (head - pos1) / self.sr
+                    start_mono = end_mono - n / self.sr
+                    # 不等推理：队列满时按策略丢弃/合并
+                    self.chunk_q.put(inp.index, (pos1 - n, pos1, start_mono, end_mono, time.monotonic()), timeout=0.0)
+                pos = inp.vad_pos = block_end
+                # 未结束的语音段：定期请求一次中间结果
+                if self.streaming and vad.voiced >= 10 and now - last_partial >= self.partial_interval:
+                    last_partial = now
+                    pos0 = pos - vad.n_frames * self.frame_len
+                    self.partial_q.put((pos0, pos, now - (head - pos0) / self.sr, now - (head - pos) / self.sr))
+        finally:
+            inp.source.stop()
+
+    def _flush_vad(self, inp: AudioInput, pos: int):
+        # 有限音源读完：还没切的语音段直接作为最后一个 chunk
+        n = inp.vad.n_frames * self.frame_len
+        if inp.vad.voiced and n:
+            end_mono = time.monotonic()
+            self.chunk_q.put(inp.index, (pos - n, pos, end_mono - n / self.sr, end_mono, end_mono), timeout=1.0)
+        inp.vad.reset()
+        inp.done.set()
+        if all(i.done.is_set() for i in self.inputs):
+            self.capture_done.set()
+
+    def _asr_loop(self, partials: bool = True):
+        # 可以有几个这样的线程共用一个模型；中间结果只由第一个做
+        streaming = self.streaming and partials
+        while not self._stop.is_set():
+            try:
+                i, chunk = self.chunk_q.get(timeout=0.05 if streaming else 0.3)
+            except queue.Empty:
+                pass
+            else:
                 try:
-                    blk = self.q.get(timeout=0.3)
+                    self._handle_chunk(self.inputs[i], *chunk)
+                except Exception:
+                    # 解码出错（如推理子进程报错）：这个 chunk 算丢失，线程继续
+                    self.asr_errors += 1
+                    self._discard_chunk(self.inputs[i], *chunk[:4])
+                finally:
+                    self.chunk_q.release(i)
+                continue
+            if streaming:
+                try:
+                    job = self.partial_q.get(timeout=0.0)
                 except queue.Empty:
                     continue
-                buf += blk
-                while len(buf) >= bsize:
-                    f = buf[:bsize]
-                    buf = buf[bsize:]
-                    done = self.vad.process(f)
-                    if done:
-                        dur = len(done) / 2 / self.sr
-                        end_mono = time.monotonic()
-                        start_mono = end_mono - dur
-                        self._handle_chunk(done, start_mono, end_mono)
-
-    def _handle_chunk(self, pcm16: bytes, start_mono: float, end_mono: float):
+                if self.shedder and self.shedder.overloaded:
+                    continue  # 定稿都跟不上时不再做中间结果
+                try:
+                    self._handle_partial(*job)
+                except Exception:
+                    self.asr_errors += 1
+
+    def _handle_partial(self, pos0: int, pos1: int, start_mono: float, end_mono: float):
         """
-        将一个 VAD 切出来的 chunk 做成多条“词组/小句”字幕：
-        - 如果有 word_timestamps，就按词的时间做分组，并精确到每组的起止时间
-        - 没有的话，退化为按 segment 的起止时间
-        每条小句都会单独送 DeepL 翻译，并进入 UI/SRT。
+        重新识别正在增长的语音段，用 LocalAgreement 决定哪些词已经稳定，
+        作为 "partial" 直接推给 UI（不翻译）。
         """
-        import math
+        inp = self.inputs[0]
+        if pos1 <= inp.final_pos or not inp.ring.valid(pos0):
+            return  # 这一段已经定稿 / 已被覆盖
+        pos0 = max(pos0, inp.final_pos)
+        segments, _ = self.model.transcribe(
+            self.ring.view(pos0, pos1), language="en", beam_size=1, vad_filter=False,
+            condition_on_previous_text=False, without_timestamps=True
+        )
+        words = " ".join((s.text or "").strip() for s in segments).split()
+        hyp = self._hyp
+        if hyp["utt"] != pos0:
+            hyp.update(utt=pos0, prev=[], stable=[])
+        # 已提交的词不再回退，只在其后追加新达成一致的词
+        stable = hyp["stable"]
+        n = local_agreement(hyp["prev"], words, len(stable))
+        stable.extend(words[len(stable):n])
+        hyp["prev"] = words
+        self.output_q.put({
+            "type": "partial",
+            "utt": pos0,
+            "stable": " ".join(stable),
+            "unstable": " ".join(words[len(stable):]),
+            "start": start_mono,
+            "end": end_mono
+        })
+
+    def _fallback_model(self):
+        # 第一次需要时在后台加载备用模型，加载好之前继续用主模型
+        if self._fallback is None and self._fallback_spec and not self._fallback_loading:
+            self._fallback_loading = True
+
+            def load():
+                try:
+                    self._fallback = get_model(self._fallback_spec, self._device, self._compute_type)
+                except Exception:
+                    self._fallback_spec = ""  # 加载不了就不再尝试
+                finally:
+                    self._fallback_loading = False
+            threading.Thread(target=load, daemon=True).start()
+        return self._fallback
+
+    def _translate_loop(self):
+        pools = self.pools
+        primary = self.langs[0]
+        co = self.coalescer
+        try:
+            while not self._stop.is_set():
+                busy = self.in_flight() > 0
+                if all(p.in_flight() < p.max_in_flight for p in pools.values()):
+                    # 有在途请求时不阻塞取新批次，以便及时交付已完成的结果；攒句时最多等到它到期
+                    wait = 0.0 if busy else 0.3
+                    if co and co.pending:
+                        wait = min(wait, co.wait_s(time.monotonic()))
+                    try:
+                        captions = self.caption_q.get(timeout=wait)
+                    except queue.Empty:
+                        captions = []
+                    if co:
+                        groups = co.add(captions, time.monotonic())
+                        if self.capture_done.is_set() and not self.chunk_q.qsize() and not self.caption_q.qsize():
+                            groups += co.flush()  # 有限音源已读完：不再等后文
+                    else:
+                        groups = [(captions, None)]
+                    for group, ctx in groups:
+                        shed = bool(self.shedder and self.shedder.skip_translation(group))
+                        for cap in group:
+                            cap["lang"] = primary
+                            if shed:
+                                cap["shed"] = True
+                        # 同一批原文分发给每种语言；其他语言用副本（各自写 tgt 和翻译时间戳）
+                        for lang, pool in pools.items():
+                            caps = group if lang == primary else [
+                                dict(c, lang=lang, **({"t": dict(c["t"])} if "t" in c else {})) for c in group]
+                            tr = self.translators[lang]
+                            fn = None if ctx is None else (
+                                lambda texts, ctx=ctx, tr=tr: tr.translate_sentence(texts, ctx))
+                            pool.submit(caps, translate=not shed, fn=fn)
+                for pool in pools.values():
+                    for cap in pool.pop_ready(timeout=0.02 / len(pools)):
+                        self.output_q.put(cap)
+        finally:
+            for pool in pools.values():
+                pool.shutdown()
+            for tr in self.translators.values():
+                tr.close()
+
+    def _discard_chunk(self, inp: AudioInput, pos0: int, pos1: int, start_mono: float, end_mono: float):
+        # 不识别这一段：标记为已定稿，并撤掉它的中间结果行
+        inp.final_pos = max(inp.final_pos, pos1)
+        if self.streaming:
+            self.output_q.put({"type": "partial", "utt": pos0, "stable": "", "unstable": "",
+                               "start": start_mono, "end": end_mono})
 
-        audio = (np.frombuffer(pcm16, dtype=np.int16).astype(np.float32) / 32768.0)
-        segments, info = self.model.transcribe(
+    def _handle_chunk(self, inp: AudioInput, pos0: int, pos1: int, start_mono: float, end_mono: float,
+                      t_vad: float = None):
+        """
+        将一个 VAD 切出来的 chunk 识别并分组成小句字幕（见 group_captions），
+        整个 chunk 的小句作为一批交给翻译线程，一次 DeepL 请求翻完，再进入 UI/SRT。
+        [pos0, pos1) 是 chunk 在 inp 环形缓冲里的位置，直接把视图交给 Whisper，不做拷贝。
+        """
+        if self._stop.is_set():
+            return
+        try:
+            audio = inp.ring.view(pos0, pos1)
+        except IndexError:
+            self.stale_chunks += 1
+            return
+        t_asr = time.monotonic()
+        model = self.model
+        if self.shedder:
+            lag = t_asr - end_mono
+            if self.shedder.drop_stale(lag):
+                # 已经过了时效，识别出来也没意义
+                self._discard_chunk(inp, pos0, pos1, start_mono, end_mono)
+                return
+            if self.shedder.use_fallback(lag):
+                model = self._fallback_model() or model
+        if self.gate and not self.gate.accept(audio):
+            self._discard_chunk(inp, pos0, pos1, start_mono, end_mono)
+            return
+        t_asr = time.monotonic()
+        segments, info = model.transcribe(
             audio, language="en", beam_size=1, vad_filter=False,
             condition_on_previous_text=False, word_timestamps=True
         )
+        # transcribe 返回的是生成器，这里一次性解码完，下面可以遍历两次
+        segments = list(segments)
+        t_asr_end = time.monotonic()
+        with self._lock:
+            self.decode_s += t_asr_end - t_asr
+            self.decoded_audio_s += (pos1 - pos0) / self.sr
+        if inp.controller:
+            inp.controller.observe((pos1 - pos0) / self.sr, t_asr_end - t_asr, self.chunk_q.queues[inp.index].qsize())
+        inp.final_pos = max(inp.final_pos, pos1)
+        if not inp.ring.valid(pos0):
+            # 解码期间这段音频已被覆盖，结果不可信
+            self.stale_chunks += 1
+            return
 
-        # 分组阈值：同一小句最多多少词、相邻词间最大间隔（秒）、句末标点断句
-        MAX_WORDS = 8
-        MAX_GAP_S = 0.5
-        PUNC_BREAKS = {".", "!", "?", ",", ";", ":", "。", "！", "？", "，", "；", "："}
+        if self._stop.is_set():
+            return  # 解码期间点了 Stop：结果不再送出（模型复用，新会话可能已经开始）
+        captions = group_captions(segments, start_mono)
+        for cap in captions:
+            cap["utt_end"] = pos1
+            if inp.label:
+                cap["speaker"] = inp.label
+            # 各环节时间戳，供 metrics.PipelineMetrics 统计
+            cap["t"] = {"capture": end_mono, "vad": t_vad or end_mono, "asr_start": t_asr, "asr_end": t_asr_end}
+        if not captions:
+            # 什么也没识别出来：同样撤掉这一段的中间结果行
+            self._discard_chunk(inp, pos0, pos1, start_mono, end_mono)
+            return
 
-        def flush_group(group):
-            if not group:
-                return
-            # 组文本与时间（相对 chunk 开头），再换算成绝对单调时钟
-            text = "".join(w.word for w in group).strip()
-            text = " ".join(text.split())  # 规整空格
-            gstart = group[0].start or 0.0
-            gend = group[-1].end or gstart
-            abs_start = start_mono + float(gstart)
-            abs_end = start_mono + float(gend)
-
-            if text:
-                tgt = self.translator.translate(text)
-                self.output_q.put({
-                    "src": text,
-                    "tgt": tgt,
-                    "start": abs_start,
-                    "end": abs_end
-                })
-            group.clear()
-
-        used_word_level = False
-        for s in segments:
-            words = getattr(s, "words", None) or []
-            if words:
-                used_word_level = True
-                group = []
-                prev_end = None
-                for w in words:
-                    token = (w.word or "").strip()
-                    gap_ok = (prev_end is None) or ((w.start or 0.0) - prev_end <= MAX_GAP_S)
-                    group.append(w)
-                    # 断句条件：到上限、遇到句末标点、词间隔太大
-                    end_with_punc = token in PUNC_BREAKS or (token and token[-1] in PUNC_BREAKS)
-                    reach_limit = len(group) >= MAX_WORDS
-                    gap_break = (prev_end is not None) and ((w.start or 0.0) - prev_end > MAX_GAP_S)
-                    if end_with_punc or reach_limit or gap_break:
-                        flush_group(group)
-                    prev_end = w.end or w.start or prev_end
-                # 收尾
-                flush_group(group)
-
-        # 如果模型/包不返回逐词时间，则退化到按 segment 输出（仍使用准确的 segment 起止）
-        if not used_word_level:
-            merged = []
-            for s in segments:
-                txt = (s.text or "").strip()
-                if not txt:
-                    continue
-                seg_start = float(getattr(s, "start", 0.0) or 0.0)
-                seg_end = float(getattr(s, "end", seg_start))
-                abs_start = start_mono + seg_start
-                abs_end = start_mono + seg_end
-                merged.append((txt, abs_start, abs_end))
-
-            # 若所有 segment 很短，也可以合并输出；这里直接逐段发送：
-            for txt, abs_start, abs_end in merged:
-                tgt = self.translator.translate(txt)
-                self.output_q.put({
-                    "src": txt,
-                    "tgt": tgt,
-                    "start": abs_start,
-                    "end": abs_end
-                })
+        with self._lock:
+            # 几个解码线程并行时，id 顺序 = 原文入队顺序
+            for cap in captions:
+                cap["id"] = next(_caption_ids)
+            if self.source_first:
+                # 原文不等翻译，马上上屏；译文回来后按 id 原地补上（"t" 与定稿共用同一个 dict）
+                for cap in captions:
+                    self.output_q.put({"type": "source", **{k: cap[k] for k in (
+                        "id", "src", "start", "end", "utt_end", "t", "words", "speaker") if k in cap}})
+        # 可能阻塞（block 策略），放在锁外；不同输入的批次因此可能互相超车，
+        # 和攒句时一样；同一输入的仍然有序（FairScheduler 每路一次只给一个 chunk）
+        self.caption_q.put(captions, timeout=1.0)
+        if self.streaming and not self.source_first:
+            # 定稿原文先顶替中间结果行，等翻译回来再由字幕接管
+            self.output_q.put({
+                "type": "partial",
+                "utt": pos0,
+                "stable": " ".join(c["src"] for c in captions),
+                "unstable": "",
+                "start": start_mono,
+                "end": end_mono
+            })
 
     def run(self):
-        t = threading.Thread(target=self._audio_loop, daemon=True)
-        t.start()
+        workers = [threading.Thread(target=self._audio_loop, args=(inp,), daemon=True) for inp in self.inputs]
+        workers += [threading.Thread(target=self._asr_loop, args=(k == 0,), daemon=True)
+                    for k in range(self.asr_workers)]
+        workers += [threading.Thread(target=self._translate_loop, daemon=True)]
+        for t in workers:
+            t.start()
         while not self._stop.is_set():
             time.sleep(0.1)
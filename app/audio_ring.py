@@ -0,0 +1,44 @@
+import numpy as np
+
+
+class AudioRing:
+    """
+    Preallocated float32 ring buffer for one mono audio stream.
+    Positions are absolute sample counts since the stream started. Every sample
+    is stored twice (at i and i + capacity), so any window of up to `capacity`
+    samples is one contiguous slice: view() never copies.
+    Single producer (the audio callback) / single consumer (VAD) without locks.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = int(capacity)
+        self._buf = np.zeros(self.capacity * 2, dtype=np.float32)
+        self.write_pos = 0
+
+    def write(self, samples: np.ndarray):
+        n = len(samples)
+        if n > self.capacity:
+            samples = samples[-self.capacity:]
+            self.write_pos += n - self.capacity
+            n = self.capacity
+        cap = self.capacity
+        i = self.write_pos % cap
+        first = min(n, cap - i)
+        # 两份镜像：[i, i+n) 和 [i+cap, i+cap+n)
+        self._buf[i:i + first] = samples[:first]
+        self._buf[i + cap:i + cap + first] = samples[:first]
+        if first < n:
+            rest = n - first
+            self._buf[:rest] = samples[first:]
+            self._buf[cap:cap + rest] = samples[first:]
+        # 数据写完再推进位置，读端看到的 write_pos 之前的样本一定是完整的
+        self.write_pos += n
+
+    def valid(self, start: int) -> bool:
+        """True while samples from `start` on have not been overwritten yet."""
+        return self.write_pos - start <= self.capacity
+
+    def view(self, start: int, end: int) -> np.ndarray:
+        if end - start > self.capacity or not self.valid(start):
+            raise IndexError("audio window no longer in ring buffer")
+        i = start % self.capacity
+        return self._buf[i:i + (end - start)]
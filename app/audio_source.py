@@ -0,0 +1,297 @@
+import os, sys, time, wave, socket, threading
+import numpy as np
+
+SR = 16000
+
+
+def load_audio(path: str, raw_rate: int = SR, channel: int = None) -> np.ndarray:
+    """
+    Load a file as 16 kHz mono float32. .pcm/.raw are headerless s16le at `raw_rate`.
+    `channel` picks one channel of a multi-channel 16-bit WAV instead of the mix.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".pcm", ".raw"):
+        x = np.fromfile(path, dtype="<i2").astype(np.float32) / 32768.0
+        rate = raw_rate
+    else:
+        try:
+            with wave.open(path, "rb") as w:
+                rate, ch, width = w.getframerate(), w.getnchannels(), w.getsampwidth()
+                data = w.readframes(w.getnframes())
+            if width != 2:
+                raise wave.Error(f"{width * 8}-bit PCM")
+        except (wave.Error, EOFError):
+            # 浮点 WAV / 其它容器交给 faster-whisper 自带的解码（PyAV）
+            from faster_whisper.audio import decode_audio
+            return decode_audio(path, sampling_rate=SR)
+        x = np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+        if ch > 1:
+            x = x.reshape(-1, ch)
+            x = x[:, channel] if channel is not None and channel < ch else x.mean(axis=1)
+    if rate != SR and len(x):
+        n = int(round(len(x) * SR / rate))
+        x = np.interp(np.arange(n) * (rate / SR), np.arange(len(x)), x).astype(np.float32)
+    return x
+
+
+class AudioSource:
+    """
+    Something that produces 16 kHz mono float32 audio for AsrEngine.
+    start(callback, wait_ready) begins delivering blocks to callback(block);
+    `wait_ready()` (optional) blocks until the consumer wants more and is only
+    used by sources that are not paced in real time. `finished` is set once a
+    finite source (file, stdin) has delivered everything.
+    """
+    sr = SR
+
+    def __init__(self):
+        self.finished = threading.Event()
+
+    def start(self, callback, wait_ready=None):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+
+class DeviceSource(AudioSource):
+    """Microphone / audio interface through sounddevice (PortAudio)."""
+    def __init__(self, device=None, blocksize: int = SR * 20 // 1000):
+        super().__init__()
+        self.device = device
+        self.blocksize = blocksize
+        self._stream = None
+
+    def start(self, callback, wait_ready=None):
+        import sounddevice as sd  # 只有实时采集才需要 PortAudio
+
+        def cb(indata, frames, time_info, status):
+            callback(indata[:, 0])
+
+        self._stream = sd.InputStream(samplerate=self.sr, channels=1, dtype="float32", device=self.device,
+                                      callback=cb, blocksize=self.blocksize)
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+class MultiChannelDevice:
+    """
+    One PortAudio stream with `channels` input channels (e.g. a USB interface
+    with a microphone per speaker), handed to AsrEngine as one AudioSource per
+    channel via sources(). The stream opens when the first channel starts and
+    closes when the last one stops.
+    """
+    def __init__(self, device=None, channels: int = 2, blocksize: int = SR * 20 // 1000):
+        self.device = device
+        self.channels = max(1, int(channels))
+        self.blocksize = blocksize
+        self._callbacks = {}
+        self._lock = threading.Lock()
+        self._stream = None
+
+    def sources(self) -> list:
+        return [ChannelSource(self, i) for i in range(self.channels)]
+
+    def _cb(self, indata, frames, time_info, status):
+        for ch, callback in list(self._callbacks.items()):
+            callback(indata[:, ch])
+
+    def attach(self, ch: int, callback):
+        import sounddevice as sd  # 只有实时采集才需要 PortAudio
+        with self._lock:
+            self._callbacks[ch] = callback
+            if self._stream is None:
+                self._stream = sd.InputStream(samplerate=SR, channels=self.channels, dtype="float32",
+                                              device=self.device, callback=self._cb, blocksize=self.blocksize)
+                self._stream.start()
+
+    def detach(self, ch: int):
+        with self._lock:
+            self._callbacks.pop(ch, None)
+            if self._stream is not None and not self._callbacks:
+                self._stream.stop()
+                self._stream.close()
+                self._stream = None
+
+
+class ChannelSource(AudioSource):
+    """One channel of a MultiChannelDevice."""
+    def __init__(self, dev: MultiChannelDevice, channel: int):
+        super().__init__()
+        self.dev = dev
+        self.channel = channel
+
+    def start(self, callback, wait_ready=None):
+        self.dev.attach(self.channel, callback)
+
+    def stop(self):
+        self.dev.detach(self.channel)
+
+
+class _ThreadedSource(AudioSource):
+    def __init__(self):
+        super().__init__()
+        self._halt = threading.Event()
+        self._thread = None
+
+    def start(self, callback, wait_ready=None):
+        self._halt.clear()
+        self._thread = threading.Thread(target=self._run, args=(callback, wait_ready), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._halt.set()
+
+    def _run(self, callback, wait_ready):
+        raise NotImplementedError
+
+
+class ArraySource(_ThreadedSource):
+    """
+    Replays an in-memory signal, paced in real time or as fast as the consumer
+    takes it (`realtime=False`, via wait_ready). With `log_times=True` it records
+    when each block was delivered (feed_pos = samples so far, feed_t = monotonic).
+    """
+    def __init__(self, audio: np.ndarray, realtime: bool = True, block_ms: int = 20, log_times: bool = False):
+        super().__init__()
+        self.audio = np.asarray(audio, dtype=np.float32)
+        self.realtime = realtime
+        self.block = self.sr * block_ms // 1000 if realtime else self.sr
+        self.log_times = log_times
+        self.feed_pos, self.feed_t = [], []
+
+    def _run(self, callback, wait_ready):
+        t0 = time.monotonic()
+        for i in range(0, len(self.audio), self.block):
+            if self._halt.is_set():
+                return
+            if self.realtime:
+                delay = t0 + i / self.sr - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            elif wait_ready is not None:
+                wait_ready()
+            x = self.audio[i:i + self.block]
+            callback(x)
+            if self.log_times:
+                self.feed_pos.append(i + len(x))
+                self.feed_t.append(time.monotonic())
+        self.finished.set()
+
+
+class WavFileSource(ArraySource):
+    """WAV (or raw .pcm/.raw s16le) file replay; `channel` as in load_audio."""
+    def __init__(self, path: str, realtime: bool = True, raw_rate: int = SR, channel: int = None, **kw):
+        super().__init__(load_audio(path, raw_rate, channel), realtime, **kw)
+        self.path = path
+
+
+class _PcmStreamSource(_ThreadedSource):
+    """Raw s16le mono 16 kHz from a byte stream, in 20 ms blocks."""
+    block_bytes = SR * 20 // 1000 * 2
+
+    def _pump(self, read, callback) -> bool:
+        # 返回 False 表示流结束
+        pending = b""
+        while not self._halt.is_set():
+            data = read(self.block_bytes)
+            if not data:
+                return False
+            pending += data
+            n = len(pending) // 2 * 2
+            if n:
+                callback(np.frombuffer(pending[:n], dtype="<i2").astype(np.float32) / 32768.0)
+                pending = pending[n:]
+        return True
+
+
+class StdinPcmSource(_PcmStreamSource):
+    """
+    Raw PCM on stdin, e.g.
+      ffmpeg -i feed.mp3 -f s16le -ac 1 -ar 16000 - | python app/main.py
+    """
+    def _run(self, callback, wait_ready):
+        stream = sys.stdin.buffer
+        self._pump(getattr(stream, "read1", stream.read), callback)
+        self.finished.set()
+
+
+class SocketSource(_PcmStreamSource):
+    """
+    Listens on a local TCP port for raw PCM; reconnects are accepted, so a
+    mixing-desk feed or ffmpeg can be restarted without restarting the session:
+      ffmpeg -i <input> -f s16le -ac 1 -ar 16000 tcp://127.0.0.1:5055
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 5055):
+        super().__init__()
+        self.host, self.port = host, int(port)
+        self._srv = None
+
+    def start(self, callback, wait_ready=None):
+        self._srv = socket.create_server((self.host, self.port))
+        self._srv.settimeout(0.5)
+        self.port = self._srv.getsockname()[1]
+        super().start(callback, wait_ready)
+
+    def _run(self, callback, wait_ready):
+        while not self._halt.is_set():
+            try:
+                conn, _ = self._srv.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            with conn:
+                conn.settimeout(0.5)
+
+                def read(n):
+                    while not self._halt.is_set():
+                        try:
+                            return conn.recv(n)
+                        except socket.timeout:
+                            continue
+                    return b""
+
+                self._pump(read, callback)
+
+    def stop(self):
+        super().stop()
+        if self._srv is not None:
+            self._srv.close()
+            self._srv = None
+
+
+SOURCE_KINDS = ("device", "file", "stdin", "socket")
+
+
+def make_source(kind: str = "device", path: str = "", port: int = 5055, device=None,
+                realtime: bool = True) -> AudioSource:
+    if kind == "file":
+        return WavFileSource(path, realtime=realtime)
+    if kind == "stdin":
+        return StdinPcmSource()
+    if kind == "socket":
+        return SocketSource(port=port)
+    return DeviceSource(device=device)
+
+
+def make_sources(kind: str = "device", path: str = "", port: int = 5055, device=None, channels: int = 1,
+                 realtime: bool = True) -> list:
+    """
+    The inputs of a multi-input session (one per speaker): the channels of one
+    device, the channels of a multi-channel WAV, or sockets on consecutive
+    ports starting at `port`. stdin is always a single input.
+    """
+    channels = max(1, int(channels))
+    if channels == 1 or kind == "stdin":
+        return [make_source(kind, path, port, device, realtime)]
+    if kind == "file":
+        return [WavFileSource(path, realtime=realtime, channel=i) for i in range(channels)]
+    if kind == "socket":
+        return [SocketSource(port=port + i) for i in range(channels)]
+    return MultiChannelDevice(device, channels).sources()
@@ -0,0 +1,90 @@
+import json, time, threading
+from collections import deque
+import numpy as np
+
+# 每条字幕在各环节打的时间戳（time.monotonic()），按流水线顺序
+TIMESTAMPS = ("capture", "vad", "asr_start", "asr_end", "src_render", "tr_start", "tr_end", "render")
+
+# 统计的阶段：名字 -> (起点, 终点)
+STAGES = (
+    ("vad", "capture", "vad"),              # 音频结束 -> VAD 切出
+    ("asr_queue", "vad", "asr_start"),      # 排队等 Whisper
+    ("asr", "asr_start", "asr_end"),        # Whisper 解码
+    ("tr_queue", "asr_end", "tr_start"),    # 排队等翻译
+    ("translate", "tr_start", "tr_end"),    # DeepL / MyMemory
+    ("ui_queue", "tr_end", "render"),       # 按序交付 + output_q + UI 取出
+    ("total", "capture", "render"),
+    ("src_total", "capture", "src_render"),  # 原文先行时原文上屏的延迟
+)
+
+
+class RollingHistogram:
+    """Last `window` samples of one stage duration (ms) with percentile summaries."""
+    def __init__(self, window: int = 200):
+        self.values = deque(maxlen=int(window))
+        self.count = 0
+
+    def add(self, v: float):
+        self.values.append(float(v))
+        self.count += 1
+
+    def summary(self) -> dict:
+        if not self.values:
+            return {"n": 0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        a = np.fromiter(self.values, dtype=np.float64, count=len(self.values))
+        p50, p95 = np.percentile(a, (50, 95))
+        return {"n": len(a), "p50": float(p50), "p95": float(p95), "max": float(a.max())}
+
+
+class PipelineMetrics:
+    """
+    Aggregates per-caption stage timings into rolling histograms, keeps the
+    latest queue depths, and optionally streams both to a JSONL file.
+    """
+    def __init__(self, window: int = 200, jsonl_path: str = ""):
+        self.hist = {name: RollingHistogram(window) for name, _, _ in STAGES}
+        self.depths = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._f = open(jsonl_path, "a", encoding="utf-8") if jsonl_path else None
+
+    def observe(self, item: dict):
+        """Record one rendered caption; `item["t"]` holds the TIMESTAMPS it has."""
+        t = item.get("t") or {}
+        stages = {}
+        for name, a, b in STAGES:
+            if a in t and b in t:
+                stages[name] = (t[b] - t[a]) * 1000.0
+        with self._lock:
+            for name, ms in stages.items():
+                self.hist[name].add(ms)
+            if self._f:
+                self._f.write(json.dumps({
+                    "type": "caption", "ts": time.time(),
+                    "src": item.get("src", ""), "ms": {k: round(v, 1) for k, v in stages.items()}
+                }, ensure_ascii=False) + "\n")
+
+    def gauge(self, depths: dict, counters: dict = None):
+        """Latest queue depths (and cumulative counters) sampled by the UI."""
+        with self._lock:
+            self.depths = dict(depths)
+            self.counters = dict(counters or {})
+            if self._f:
+                self._f.write(json.dumps({
+                    "type": "gauges", "ts": time.time(), "depths": self.depths, "counters": self.counters
+                }) + "\n")
+                self._f.flush()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "stages": {name: h.summary() for name, h in self.hist.items()},
+                "depths": dict(self.depths),
+                "counters": dict(self.counters),
+            }
+
+    def close(self):
+        with self._lock:
+            if self._f:
+                self._f.close()
+                self._f = None
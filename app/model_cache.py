@@ -0,0 +1,69 @@
+import threading, time
+import numpy as np
+
+# 进程内共享的 WhisperModel：model_key(...) -> 已预热的模型（或 WhisperProcess）
+_models = {}
+_lock = threading.Lock()     # 只保护上面和下面两个 dict，加载本身不持锁
+_loading = {}                # model_key -> 正在加载时的 threading.Event
+
+
+def model_key(model_name: str, device: str = "cpu", compute_type: str = "int8",
+              cpu_threads: int = 0, num_workers: int = 1, out_of_process: bool = False) -> tuple:
+    return (model_name, device, compute_type, int(cpu_threads), max(1, int(num_workers)), bool(out_of_process))
+
+
+def get_model(model_name: str, device: str = "cpu", compute_type: str = "int8", progress=None,
+              cpu_threads: int = 0, num_workers: int = 1, out_of_process: bool = False):
+    """
+    Return a loaded and warmed-up WhisperModel, loading it on first use.
+    Blocking; call it off the UI thread. `progress(str)` gets status messages.
+    A second caller asking for a model that is being loaded waits for that load
+    instead of building it twice; other keys and evict() are not held up by it.
+    With `out_of_process=True` the model lives in a whisper_worker.WhisperProcess
+    (same transcribe() interface). cpu_threads=0 lets CTranslate2 pick.
+    """
+    key = model_key(model_name, device, compute_type, cpu_threads, num_workers, out_of_process)
+    while True:
+        with _lock:
+            m = _models.get(key)
+            if m is not None:
+                return m
+            ev = _loading.get(key)
+            if ev is None:
+                ev = _loading[key] = threading.Event()
+                break
+        ev.wait()  # 别的线程正在加载同一个模型；加载失败的话下一轮自己来
+    try:
+        t0 = time.monotonic()
+        if progress:
+            progress(f"Loading {model_name} ({device}/{compute_type})…")
+        if out_of_process:
+            from whisper_worker import WhisperProcess
+            m = WhisperProcess(*key[:5]).start(progress)
+        else:
+            from faster_whisper import WhisperModel
+            m = WhisperModel(model_name, device=device, compute_type=compute_type,
+                             cpu_threads=key[3], num_workers=key[4])
+            if progress:
+                progress(f"Warming up {model_name}…")
+            list(m.transcribe(np.zeros(16000, dtype=np.float32), beam_size=1, language="en")[0])
+        with _lock:
+            _models[key] = m
+        if progress:
+            progress(f"{model_name} ready in {time.monotonic() - t0:.1f}s")
+        return m
+    finally:
+        with _lock:
+            _loading.pop(key, None)
+        ev.set()
+
+
+def evict(key: tuple = None, keep: tuple = None) -> int:
+    """Drop one cached model (`key`), or all except `keep`. Returns how many were dropped."""
+    with _lock:
+        keys = [key] if key is not None else [k for k in _models if k != keep]
+        dropped = [m for m in (_models.pop(k, None) for k in keys) if m is not None]
+    for m in dropped:
+        if hasattr(m, "close"):
+            m.close()  # 独立进程的 worker 要显式结束（锁外，不挡别的调用）
+    return len(dropped)
@@ -19,20 +19,72 @@ SETTINGS_PATH = os.path.join(app_support_dir(), "settings.json")
 DEFAULTS = {
     "deepl_key": "",
     "target_lang": "ZH",
+    # 同时翻译成的其他语言（逗号分隔，如 "JA,ES"），各自一个悬浮窗和字幕文件
+    "extra_target_langs": "",
     "show_source": True,
     "model_name": "base.en",
     "device": "cpu",
     "compute_type": "int8",
+    "asr_process": False,
+    "cpu_threads": 0,
+    "num_workers": 1,
     "min_chunk_ms": 600,
     "max_sil_ms": 350,
     "vad_thresh_mult": 2.5,
+    "speech_gate": True,
+    "speech_gate_threshold": 0.5,
+    "speech_gate_min_ms": 250,
+    "adaptive_chunking": False,
+    "adaptive_max_chunk_ms": 2400,
+    "adaptive_max_sil_ms": 700,
+    "load_shedding": True,
+    "stale_deadline_s": 20.0,
+    "skip_translate_lag_s": 8.0,
+    "fallback_model": "tiny.en",
+    "fallback_lag_s": 12.0,
+    "recover_lag_s": 2.0,
+    "recover_hold_s": 30.0,
+    "chunk_queue_size": 4,
+    "caption_queue_size": 32,
+    "overflow_policy": "merge",
+    "streaming": False,
+    "partial_interval_ms": 500,
+    # 原文识别完就上屏，译文回来后原地补上
+    "source_first": True,
+    "translate_workers": 4,
+    "translate_budget_s": 4.0,
+    # 跨 chunk 攒成整句再翻译（带上一句作上下文），最多多等这么久
+    "coalesce_sentences": True,
+    "coalesce_max_delay_s": 2.5,
+    "breaker_failures": 3,
+    "breaker_cooldown_s": 30.0,
+    "translation_cache_size": 2000,
+    "translation_cache_ttl_s": 604800,
+    "translation_cache_disk": True,
+    "audio_source": "device",
+    "audio_source_path": "",
+    "audio_source_port": 5055,
+    "input_device": "",
+    # 多路输入（每个说话人一路）：设备的前 N 个声道 / 多声道 WAV 的各声道 / 连续的 N 个 TCP 端口
+    "input_channels": 1,
+    "input_labels": "",
+    "speaker_latency_s": 3.0,
     "max_lines": 10,
     "font_size_src": 18,
     "font_size_tgt": 22,
     "save_txt": False,
     "save_txt_path": "",
     "save_srt": False,
-    "save_srt_path": ""
+    "save_srt_path": "",
+    "save_vtt": False,
+    "save_vtt_path": "",
+    "save_jsonl": False,
+    "save_jsonl_path": "",
+    "writer_flush_s": 1.0,
+    "writer_pending_timeout_s": 15.0,
+    "metrics_jsonl_path": "",
+    # 窗口出来后在后台预先导入 faster_whisper 等重模块
+    "prefetch_imports": True
 }
 
 def load_settings():
@@ -1,71 +1,247 @@
-import os, time
+import os, json, time, queue, threading
+from collections import OrderedDict
 
-def fmt_ts(seconds: float) -> str:
+def fmt_ts(seconds: float, sep: str = ",") -> str:
     if seconds < 0:
         seconds = 0.0
     ms = int(round(seconds * 1000.0))
     h = ms // (3600*1000); ms %= (3600*1000)
     m = ms // (60*1000);   ms %= (60*1000)
     s = ms // 1000;        ms %= 1000
-    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+    return f"{h:02d}:{m:02d}:{s:02d}{sep}{ms:03d}"
 
-class TxtWriter:
-    def __init__(self, path):
+class _CaptionFile:
+    """
+    Base for the caption writers. Output goes to `<path>.part` and is renamed
+    over `path` on close(), so a finished file is never half-written.
+    write() only buffers; flush() pushes to disk (AsyncCaptionWriter calls it
+    on its flush interval). Captions are dicts with "src", "tgt", "start",
+    "end" and optionally "words" (see asr_engine.group_captions) and
+    "speaker" (multi-input sessions), which prefixes the cue text.
+    """
+    def __init__(self, path, session_start_monotonic: float = 0.0):
         self.path = path
         self._f = None
+        self.index = 0
+        self.t0 = session_start_monotonic
 
     def open(self):
         if not self.path:
             return
         os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
-        self._f = open(self.path, "w", encoding="utf-8")
-        self._f.write(f"# GuiLiveSubs session {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-        self._f.flush()
+        self._f = open(self.path + ".part", "w", encoding="utf-8")
+        self._header()
 
-    def write_line(self, src: str, tgt: str):
-        if not self._f:
-            return
-        if src:
-            self._f.write(src.strip() + "\n")
-        if tgt:
-            self._f.write(tgt.strip() + "\n")
-        self._f.flush()
+    def _header(self):
+        pass
+
+    def _rel(self, start_monotonic: float, end_monotonic: float):
+        start_rel = max(0.0, start_monotonic - self.t0)
+        return start_rel, max(start_rel, end_monotonic - self.t0)
+
+    def write(self, cap: dict):
+        raise NotImplementedError
+
+    def flush(self):
+        if self._f:
+            self._f.flush()
 
     def close(self):
         if self._f:
+            self._f.flush()
+            os.fsync(self._f.fileno())
             self._f.close()
             self._f = None
+            os.replace(self.path + ".part", self.path)
 
-class SrtWriter:
-    def __init__(self, path, session_start_monotonic: float = 0.0):
-        self.path = path
-        self._f = None
-        self.index = 0
-        self.t0 = session_start_monotonic
+class TxtWriter(_CaptionFile):
+    def _header(self):
+        self._f.write(f"# GuiLiveSubs session {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
 
-    def open(self):
-        if not self.path:
+    def write_line(self, src: str, tgt: str, speaker: str = ""):
+        if not self._f:
             return
-        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
-        self._f = open(self.path, "w", encoding="utf-8")
+        lines = [x.strip() for x in (src, tgt) if x]
+        if lines and speaker:
+            lines[0] = f"{speaker}: {lines[0]}"
+        for line in lines:
+            self._f.write(line + "\n")
+
+    def write(self, cap: dict):
+        self.write_line(cap.get("src", ""), cap.get("tgt", ""), cap.get("speaker", ""))
+
+class SrtWriter(_CaptionFile):
+    sep = ","
 
-    def write_caption(self, start_monotonic: float, end_monotonic: float, src: str, tgt: str):
+    def write_caption(self, start_monotonic: float, end_monotonic: float, src: str, tgt: str, speaker: str = ""):
         if not self._f:
             return
         self.index += 1
-        start_rel = max(0.0, start_monotonic - self.t0)
-        end_rel = max(start_rel, end_monotonic - self.t0)
+        start_rel, end_rel = self._rel(start_monotonic, end_monotonic)
         self._f.write(f"{self.index}\n")
-        self._f.write(f"{fmt_ts(start_rel)} --> {fmt_ts(end_rel)}\n")
+        self._f.write(f"{fmt_ts(start_rel, self.sep)} --> {fmt_ts(end_rel, self.sep)}\n")
         lines = []
         if src:
             lines.append(src.strip())
         if tgt:
             lines.append(tgt.strip())
+        if lines and speaker:
+            lines[0] = self._speaker(speaker, lines[0])
         self._f.write("\n".join(lines) + "\n\n")
-        self._f.flush()
+
+    def _speaker(self, speaker: str, line: str) -> str:
+        return f"{speaker}: {line}"
+
+    def write(self, cap: dict):
+        self.write_caption(cap.get("start", 0.0), cap.get("end", 0.0), cap.get("src", ""), cap.get("tgt", ""),
+                           cap.get("speaker", ""))
+
+class VttWriter(SrtWriter):
+    """WebVTT: same cues as SRT with a header and '.' before the milliseconds; speakers as voice spans."""
+    sep = "."
+
+    def _header(self):
+        self._f.write("WEBVTT\n\n")
+
+    def _speaker(self, speaker: str, line: str) -> str:
+        return f"<v {speaker}>{line}"
+
+class JsonlWriter(_CaptionFile):
+    """
+    One JSON object per caption, times in seconds from session start:
+      {"i", "start", "end", "src", "tgt", "words": [{"w", "start", "end", "p"}]}
+    "words" keeps faster-whisper's word timestamps (empty when not available);
+    multi-input sessions add "speaker".
+    """
+    def write(self, cap: dict):
+        if not self._f:
+            return
+        self.index += 1
+        start_rel, end_rel = self._rel(cap.get("start", 0.0), cap.get("end", 0.0))
+        words = []
+        for w in cap.get("words") or []:
+            ws, we = self._rel(w["start"], w["end"])
+            words.append({"w": w["w"], "start": round(ws, 3), "end": round(we, 3), "p": w.get("p")})
+        self._f.write(json.dumps({
+            "i": self.index, "start": round(start_rel, 3), "end": round(end_rel, 3),
+            "src": (cap.get("src") or "").strip(), "tgt": (cap.get("tgt") or "").strip(), "words": words,
+            **({"speaker": cap["speaker"]} if cap.get("speaker") else {})
+        }, ensure_ascii=False) + "\n")
+
+WRITERS = {"txt": TxtWriter, "srt": SrtWriter, "vtt": VttWriter, "jsonl": JsonlWriter}
+
+
+def lang_path(path: str, lang: str) -> str:
+    """subs/talk.srt + "JA" -> subs/talk.ja.srt (files of an additional target language)."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{lang.lower()}{ext}"
+
+class AsyncCaptionWriter:
+    """
+    Feeds captions to several writers from a background thread so slow disks
+    never block the caller. write() just enqueues; the thread writes whatever
+    has queued up as a batch and flushes every `flush_interval_s`. close()
+    drains the queue and finalizes each file (atomic rename). Errors from a
+    writer disable that writer and are kept in `errors`.
+    Source-first sessions call write_source() when a caption's source text is
+    known and write() with the same "id" once it is translated. Entries are
+    written in id order: each waits for its translation, or is written
+    source-only once it has waited `pending_timeout_s` or when a later caption
+    of the same speaker is finalized first (its translation was dropped).
+    """
+    def __init__(self, writers: list, flush_interval_s: float = 1.0, pending_timeout_s: float = 15.0):
+        self.writers = list(writers)
+        self.flush_interval = max(0.05, float(flush_interval_s))
+        self.pending_timeout = float(pending_timeout_s)
+        self.errors = []
+        self._q = queue.SimpleQueue()
+        self._thread = None
+        self._pending = OrderedDict()  # id -> [到达时间, 原文 caption, 定稿]，只在写线程里用
+        self._done_id = 0
+
+    def open(self):
+        for w in list(self.writers):
+            self._guard(w, w.open)
+        self._thread = threading.Thread(target=self._run, daemon=True, name="caption-writer")
+        self._thread.start()
+
+    def write(self, cap: dict):
+        self._q.put(cap)
+
+    def write_source(self, cap: dict):
+        self._q.put(("source", cap))
+
+    def _guard(self, w, fn, *args):
+        try:
+            fn(*args)
+        except OSError as e:
+            self.errors.append(f"{w.path}: {e}")
+            self.writers.remove(w)
+
+    def _run(self):
+        last_flush = time.monotonic()
+        done = False
+        while not done:
+            try:
+                batch = [self._q.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                batch = []
+            while True:
+                try:
+                    batch.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            if batch and batch[-1] is None:
+                batch.pop(); done = True
+            out = self._order(batch, done)
+            for w in list(self.writers):
+                for cap in out:
+                    if w not in self.writers:
+                        break
+                    self._guard(w, w.write, cap)
+            if time.monotonic() - last_flush >= self.flush_interval or done:
+                for w in list(self.writers):
+                    self._guard(w, w.flush)
+                last_flush = time.monotonic()
+
+    def _order(self, batch: list, done: bool) -> list:
+        # 按 id 顺序写出，原文先到的条目等译文；同一说话人的定稿按 id 递增到达，
+        # 比它早还没定稿的就是译文丢了，按原文写出（不同说话人的句子可能在攒句时互相超车）
+        out = []
+        for ev in batch:
+            if isinstance(ev, tuple):
+                cap = ev[1]
+                if cap["id"] > self._done_id:
+                    self._pending[cap["id"]] = [time.monotonic(), dict(cap, tgt=""), None]
+                continue
+            cid = ev.get("id")
+            if cid is not None and cid <= self._done_id:
+                continue  # 已经按原文超时写出
+            if cid is None or (cid not in self._pending and not self._pending):
+                # 没有原文条目（非原文先行）：直接写；_done_id 只记经过 _pending 写出的，
+                # 否则别的说话人超车的定稿会把更早的 id 误判为已写出
+                out.append(ev)
+                continue
+            for k, entry in self._pending.items():
+                if k >= cid:
+                    break
+                if entry[2] is None and entry[1] and entry[1].get("speaker") == ev.get("speaker"):
+                    entry[2] = entry[1]
+            self._pending.setdefault(cid, [time.monotonic(), None, None])[2] = ev
+        now = time.monotonic()
+        while self._pending:
+            cid, (t, src, final) = next(iter(self._pending.items()))
+            if final is None and not done and now - t < self.pending_timeout:
+                break
+            self._pending.popitem(last=False)
+            self._done_id = max(self._done_id, cid)
+            out.append(final or src)
+        return out
 
     def close(self):
-        if self._f:
-            self._f.close()
-            self._f = None
+        if self._thread is not None:
+            self._q.put(None)
+            self._thread.join()
+            self._thread = None
+        for w in list(self.writers):
+            self._guard(w, w.close)
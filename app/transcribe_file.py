@@ -0,0 +1,202 @@
+# app/transcribe_file.py
+"""
+Headless captioning of recorded talks: the same VAD + Whisper + DeepL pipeline
+as the live app, run over WAV / raw PCM files with no Qt and no audio device.
+
+  python app/transcribe_file.py talk1.wav talk2.wav --out-dir subs --format srt,txt --jobs 2
+
+Runs as fast as the CPU allows: no real-time pacing, translation of chunk N
+overlaps with decoding of chunk N+1, and --jobs files are processed in parallel
+processes (cores are split between them). Defaults come from the app settings.
+"""
+import argparse, os, sys, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+
+from settings import load_settings
+from srt_writer import WRITERS
+from asr_engine import (
+    EnergyVadChunker, SpeechGate, DeepLClient, TranslationPool, SentenceCoalescer, group_captions, deepl_api_base
+)
+from translation_cache import TranslationCache, CACHE_DB_PATH
+from audio_source import load_audio, SR
+
+
+def vad_spans(audio: np.ndarray, vad: EnergyVadChunker, block_s: float = 1.0) -> list:
+    """Cut a whole recording into [pos0, pos1) sample spans, as the live VAD would."""
+    fl = vad.frame_len
+    usable = len(audio) // fl * fl
+    block = max(1, int(block_s * SR) // fl) * fl
+    spans = []
+    for b0 in range(0, usable, block):
+        for end, n in vad.process_block(audio[b0:min(b0 + block, usable)]):
+            spans.append((b0 + end - n, b0 + end))
+    if vad.voiced:
+        # 文件结束时还没切的语音段
+        spans.append((usable - vad.n_frames * fl, usable))
+    return spans
+
+
+def caption_audio(audio: np.ndarray, model, translate_many=None, translate_workers: int = 4,
+                  min_chunk_ms=600, max_sil_ms=350, vad_thresh_mult=2.5, beam_size=1, gate=None,
+                  translate_sentence=None, coalesce_s=0.0) -> list:
+    """
+    Returns [{"src", "tgt", "start", "end", "words"}] with times in seconds from the start
+    of `audio`. Batches are translated in the background while the next chunk decodes.
+    With a SpeechGate `gate`, non-speech spans are skipped. With `translate_sentence`
+    (DeepLClient.translate_sentence) and `coalesce_s` > 0, whole sentences spanning up
+    to `coalesce_s` seconds of audio are translated at once (see SentenceCoalescer).
+    """
+    vad = EnergyVadChunker(SR, 20, min_chunk_ms, max_sil_ms, vad_thresh_mult)
+    pool = TranslationPool(translate_many, translate_workers) if translate_many else None
+    co = SentenceCoalescer(coalesce_s) if pool and translate_sentence and coalesce_s > 0 else None
+
+    def submit(groups):
+        for group, ctx in groups:
+            pool.submit(group, fn=lambda texts, ctx=ctx: translate_sentence(texts, ctx))
+
+    out = []
+    try:
+        for pos0, pos1 in vad_spans(audio, vad):
+            if gate and not gate.accept(audio[pos0:pos1]):
+                continue
+            segments, _ = model.transcribe(
+                audio[pos0:pos1], language="en", beam_size=beam_size, vad_filter=False,
+                condition_on_previous_text=False, word_timestamps=True
+            )
+            captions = group_captions(list(segments), pos0 / SR)
+            if co:
+                # 文件里用音频时间计时：一句最多攒 coalesce_s 秒音频
+                submit(co.add(captions, pos1 / SR))
+                out.extend(pool.pop_ready())
+            elif pool:
+                pool.submit(captions)
+                out.extend(pool.pop_ready())
+            else:
+                for cap in captions:
+                    cap["tgt"] = ""
+                out.extend(captions)
+        if co:
+            submit(co.flush())
+        while pool and pool.in_flight():
+            out.extend(pool.pop_ready(timeout=0.5))
+    finally:
+        if pool:
+            pool.shutdown()
+    return out
+
+
+def write_outputs(captions: list, base: str, formats: list):
+    for fmt in formats:
+        w = WRITERS[fmt](f"{base}.{fmt}", session_start_monotonic=0.0); w.open()
+        for c in captions:
+            w.write(c)
+        w.close()
+
+
+# ---------- 每个进程各自持有一份模型 / 翻译客户端 ----------
+_worker = {}
+
+
+def _init_worker(opts: dict):
+    from faster_whisper import WhisperModel
+    _worker["opts"] = opts
+    _worker["model"] = WhisperModel(
+        opts["model"], device=opts["device"], compute_type=opts["compute_type"],
+        cpu_threads=opts["cpu_threads"]
+    )
+    translator = None
+    if opts["deepl_key"] and not opts["no_translate"]:
+        cache = None if opts["no_cache"] else TranslationCache(db_path=CACHE_DB_PATH)
+        translator = DeepLClient(
+            opts["deepl_key"], api_base=deepl_api_base(opts["deepl_key"]),
+            target_lang=opts["target_lang"], source_lang="EN",
+            max_connections=opts["translate_workers"], cache=cache
+        )
+    _worker["translator"] = translator
+
+
+def _run_one(path: str):
+    opts = _worker["opts"]
+    t0 = time.perf_counter()
+    audio = load_audio(path, opts["raw_rate"])
+    tr = _worker["translator"]
+    captions = caption_audio(
+        audio, _worker["model"], tr.translate_many if tr else None, opts["translate_workers"],
+        opts["min_chunk_ms"], opts["max_sil_ms"], opts["vad_thresh_mult"], opts["beam_size"],
+        SpeechGate(opts["speech_gate"]) if opts["speech_gate"] else None,
+        tr.translate_sentence if tr else None, opts["coalesce_s"]
+    )
+    stem = os.path.splitext(os.path.basename(path))[0]
+    out_dir = opts["out_dir"] or os.path.dirname(os.path.abspath(path))
+    os.makedirs(out_dir, exist_ok=True)
+    write_outputs(captions, os.path.join(out_dir, stem), opts["formats"])
+    return path, len(audio) / SR, time.perf_counter() - t0, len(captions)
+
+
+def main(argv=None):
+    d = load_settings()
+    ap = argparse.ArgumentParser(description="Caption and translate recorded audio files (no GUI, no audio device).")
+    ap.add_argument("files", nargs="+", help="WAV files, or .pcm/.raw headerless s16le mono")
+    ap.add_argument("--out-dir", default="", help="output folder (default: next to each input)")
+    ap.add_argument("--format", default="srt,txt", help="comma separated: srt,txt,vtt,jsonl")
+    ap.add_argument("--jobs", type=int, default=1, help="files processed in parallel")
+    ap.add_argument("--model", default=d["model_name"])
+    ap.add_argument("--device", default=d["device"])
+    ap.add_argument("--compute-type", default=d["compute_type"])
+    ap.add_argument("--beam-size", type=int, default=1)
+    ap.add_argument("--target-lang", default=d["target_lang"])
+    ap.add_argument("--deepl-key", default=os.getenv("DEEPL_AUTH_KEY", d["deepl_key"]))
+    ap.add_argument("--no-translate", action="store_true", help="source captions only")
+    ap.add_argument("--no-cache", action="store_true", help="bypass the translation cache")
+    ap.add_argument("--translate-workers", type=int, default=int(d.get("translate_workers", 4)))
+    ap.add_argument("--raw-rate", type=int, default=SR, help="sample rate of .pcm/.raw input")
+    ap.add_argument("--min-chunk-ms", type=int, default=int(d["min_chunk_ms"]))
+    ap.add_argument("--max-sil-ms", type=int, default=int(d["max_sil_ms"]))
+    ap.add_argument("--vad-thresh-mult", type=float, default=float(d["vad_thresh_mult"]))
+    ap.add_argument("--speech-gate", type=float,
+                    default=float(d["speech_gate_threshold"]) if d.get("speech_gate", True) else 0.0,
+                    help="Silero speech probability a chunk needs to be transcribed (0 = off)")
+    ap.add_argument("--coalesce-s", type=float,
+                    default=float(d["coalesce_max_delay_s"]) if d.get("coalesce_sentences", True) else 0.0,
+                    help="translate whole sentences spanning up to this many seconds (0 = per chunk)")
+    args = ap.parse_args(argv)
+
+    formats = [f.strip().lower() for f in args.format.split(",") if f.strip()]
+    unknown = [f for f in formats if f not in WRITERS]
+    if unknown:
+        ap.error(f"unknown format(s): {', '.join(unknown)} (choose from {', '.join(WRITERS)})")
+
+    jobs = max(1, min(args.jobs, len(args.files)))
+    opts = dict(
+        model=args.model, device=args.device, compute_type=args.compute_type, beam_size=args.beam_size,
+        cpu_threads=max(1, (os.cpu_count() or 1) // jobs),
+        deepl_key=args.deepl_key, target_lang=args.target_lang,
+        no_translate=args.no_translate, no_cache=args.no_cache, translate_workers=args.translate_workers,
+        raw_rate=args.raw_rate, out_dir=args.out_dir,
+        formats=formats,
+        min_chunk_ms=args.min_chunk_ms, max_sil_ms=args.max_sil_ms, vad_thresh_mult=args.vad_thresh_mult,
+        speech_gate=args.speech_gate, coalesce_s=args.coalesce_s,
+    )
+    if not opts["deepl_key"] and not args.no_translate:
+        print("No DeepL key (settings or DEEPL_AUTH_KEY): writing source captions only.", file=sys.stderr)
+
+    def report(res):
+        path, audio_s, elapsed, n = res
+        rtf = elapsed / audio_s if audio_s else 0.0
+        print(f"{path}: {audio_s:.1f}s audio in {elapsed:.1f}s (RTF {rtf:.2f}), {n} captions")
+
+    if jobs == 1:
+        _init_worker(opts)
+        for f in args.files:
+            report(_run_one(f))
+        return 0
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(opts,)) as ex:
+        futs = [ex.submit(_run_one, f) for f in args.files]
+        for fut in as_completed(futs):
+            report(fut.result())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import os, time, sqlite3, threading, unicodedata
+from collections import OrderedDict
+
+from settings import app_support_dir
+
+CACHE_DB_PATH = os.path.join(app_support_dir(), "translations.sqlite3")
+
+
+def normalize_text(text: str) -> str:
+    # 统一 Unicode 形式并规整空白，"Hello  world " 与 "Hello world" 命中同一条
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+
+class TranslationCache:
+    """
+    Two-level translation cache keyed on (normalized text, source lang, target lang).
+    Level 1 is an in-memory LRU bounded by `max_items` and `ttl_s`; level 2 is an
+    optional SQLite file (`db_path`) that survives restarts. Thread-safe.
+    Counters: hits (memory), disk_hits, misses.
+    """
+    def __init__(self, max_items: int = 2000, ttl_s: float = 7 * 24 * 3600, db_path: str = None):
+        self.max_items = max(1, int(max_items))
+        self.ttl_s = float(ttl_s)
+        self._lru = OrderedDict()  # key -> (tgt, stored_at)
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if db_path:
+            try:
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS translations ("
+                    " src_lang TEXT, tgt_lang TEXT, text TEXT, tgt TEXT, ts REAL,"
+                    " PRIMARY KEY (src_lang, tgt_lang, text))"
+                )
+                self._db.execute("DELETE FROM translations WHERE ts < ?", (time.time() - self.ttl_s,))
+                self._db.commit()
+            except sqlite3.Error:
+                # 磁盘缓存坏了/不可写就只用内存层
+                self._db = None
+
+    @staticmethod
+    def _key(text: str, src_lang: str, tgt_lang: str):
+        return (src_lang or "", tgt_lang or "", normalize_text(text))
+
+    def get(self, text: str, src_lang: str, tgt_lang: str):
+        key = self._key(text, src_lang, tgt_lang)
+        now = time.time()
+        with self._lock:
+            hit = self._lru.get(key)
+            if hit is not None:
+                if now - hit[1] <= self.ttl_s:
+                    self._lru.move_to_end(key)
+                    self.hits += 1
+                    return hit[0]
+                del self._lru[key]
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT tgt, ts FROM translations WHERE src_lang=? AND tgt_lang=? AND text=?", key
+                    ).fetchone()
+                except sqlite3.Error:
+                    row = None
+                if row and now - row[1] <= self.ttl_s:
+                    self._remember(key, row[0], row[1])
+                    self.disk_hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, text: str, src_lang: str, tgt_lang: str, tgt: str):
+        key = self._key(text, src_lang, tgt_lang)
+        now = time.time()
+        with self._lock:
+            self._remember(key, tgt, now)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO translations (src_lang, tgt_lang, text, tgt, ts) VALUES (?,?,?,?,?)",
+                        key + (tgt, now)
+                    )
+                    self._db.commit()
+                except sqlite3.Error:
+                    pass
+
+    def _remember(self, key, tgt: str, ts: float):
+        self._lru[key] = (tgt, ts)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_items:
+            self._lru.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "size": len(self._lru),
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
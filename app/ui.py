@@ -1,5 +1,5 @@
 # app/ui.py
-from PyQt6.QtCore import Qt, QTimer, QRect, QPoint
+from PyQt6.QtCore import Qt, QTimer, QRect, QPoint, QObject, pyqtSignal
 from PyQt6.QtGui import (
     QAction, QFont, QKeySequence, QShortcut, QIcon, QColor,
     QCursor, QGuiApplication, QTextCursor
@@ -10,11 +10,26 @@ from PyQt6.QtWidgets import (
     QDialogButtonBox, QCheckBox, QFileDialog, QMessageBox, QTextBrowser,
     QPushButton, QHBoxLayout, QFrame, QToolButton, QGraphicsDropShadowEffect
 )
-import queue, time
+import os, sys, queue, time, threading
+from collections import OrderedDict
+from html import escape as html_escape
 
 from settings import load_settings, save_settings
-from asr_engine import AsrEngine
-from srt_writer import TxtWriter, SrtWriter
+from srt_writer import WRITERS, AsyncCaptionWriter, lang_path
+# asr_engine / audio_source / metrics / model_cache 会拉进 numpy、faster_whisper、
+# requests……，首帧之前一律不导入：窗口出来后后台预取，或者按 Start 时再导入
+
+# 窗口显示后在后台线程预先导入的模块（按依赖顺序）
+PREFETCH_MODULES = ("numpy", "requests", "faster_whisper", "asr_engine", "metrics", "translation_cache")
+
+
+def prefetch_modules(names=PREFETCH_MODULES):
+    import importlib
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass  # 缺依赖等到 Start 时再报错
 
 # ----------- 语言列表 -----------
 LANGS = [
@@ -36,6 +51,7 @@ QMainWindow { background-color: #0f172a; }
 QLabel#Title   { color: #e2e8f0; font-size: 26px; font-weight: 700; }
 QLabel#Subtitle{ color: #94a3b8; font-size: 14px; }
 QLabel#Summary { color: #a1a1aa; font-size: 12px; }
+QLabel#Stats   { color: #cbd5e1; font-family: Menlo, Consolas, monospace; font-size: 12px; }
 QToolButton { background-color: #1e293b; color: #e2e8f0;
   border: 1px solid rgba(255,255,255,0.10); border-radius: 12px;
   padding: 10px 16px; font-size: 15px; }
@@ -82,15 +98,32 @@ class Overlay(QWidget):
         self.tgt_view.setFont(QFont("Segoe UI", font_tgt))
         self.tgt_view.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
 
+        # 流式中间结果：单独一行，原地刷新，不进滚动文本
+        self.partial_view = QLabel(root)
+        self.partial_view.setFont(QFont("Segoe UI", font_src))
+        self.partial_view.setTextFormat(Qt.TextFormat.RichText)
+        self.partial_view.setWordWrap(True)
+        self.partial_view.setStyleSheet("color: #ffffff; background: transparent;")
+        self.partial_view.setVisible(False)
+        self.partial_utt = None
+
         lay.addWidget(self.src_view, 1)
+        lay.addWidget(self.partial_view, 0)
         lay.addWidget(self.tgt_view, 1)
         lay.setStretch(0, 1)
-        lay.setStretch(1, 1)
+        lay.setStretch(2, 1)
         # 保证目标框一定可见
         self.tgt_view.setMinimumHeight(40)
         self.tgt_view.setVisible(True)
 
         self.max_lines = int(max_lines)
+        for v in (self.src_view, self.tgt_view):
+            doc = v.document()
+            doc.setUndoRedoEnabled(False)  # 只追加，不需要撤销栈（否则内存一直涨）
+            doc.setMaximumBlockCount(self.max_lines)  # 超出的最早几行由 Qt 增量丢掉
+        # 原文先行：等译文的行，id -> (tgt_view 里那一行的光标, 第几行)
+        self._pending = OrderedDict()
+        self._tgt_rows = 0
         self._moving = False
         self._resizing = False
         self._resize_edges = (False, False, False, False)
@@ -101,35 +134,106 @@ class Overlay(QWidget):
 
     def set_fonts(self, font_src_size: int, font_tgt_size: int):
         self.src_view.setFont(QFont("Segoe UI", int(font_src_size)))
+        self.partial_view.setFont(QFont("Segoe UI", int(font_src_size)))
         self.tgt_view.setFont(QFont("Segoe UI", int(font_tgt_size)))
 
+    def set_max_lines(self, n: int):
+        self.max_lines = int(n)
+        for v in (self.src_view, self.tgt_view):
+            v.document().setMaximumBlockCount(self.max_lines)
+        self._pending.clear()  # 旧行可能已被裁掉
+
     # ---------- 文本追加 ----------
-    def _append_text(self, view: QTextBrowser, text: str):
-        if text is None:
-            return
-        txt = str(text).rstrip("\n")
-        cur = view.textCursor()
+    def _append_lines(self, view: QTextBrowser, lines: list):
+        # 一次编辑块里追加多行（每行一个 block），只触发一次重排和重绘；
+        # 行数上限靠 setMaximumBlockCount，每次追加的代价与已有文本长度无关
+        # 返回每行所在 block 的光标（随文档编辑自动移位），供之后原地改写
+        if not lines:
+            return []
+        doc = view.document()
+        cur = QTextCursor(doc)
         cur.movePosition(QTextCursor.MoveOperation.End)
-        if view.toPlainText() and not view.toPlainText().endswith("\n"):
-            cur.insertText("\n")
-        cur.insertText(txt)
-        cur.insertText("\n")
-        view.setTextCursor(cur)
-
-        # 控制最大行数（简单保守：超出就重写尾部 N 行）
-        lines = view.toPlainText().splitlines()
-        if len(lines) > self.max_lines:
-            lines = lines[-self.max_lines:]
-            view.setPlainText("\n".join(lines))
+        cur.beginEditBlock()
+        marks = []
+        for txt in lines:
+            if not doc.isEmpty():
+                cur.insertBlock()
+            mark = QTextCursor(cur)
+            mark.setKeepPositionOnInsert(True)  # 停在行首，不随本行/后面插入的文字后移
+            marks.append(mark)
+            cur.insertText(str(txt).rstrip("\n"))
+        cur.endEditBlock()
+        sb = view.verticalScrollBar()
+        sb.setValue(sb.maximum())
+        return marks
+
+    def append_many(self, rows: list):
+        """
+        Append [(src, tgt)] pairs as a single update per view. A row may carry
+        a third element, an id: its translation line can then be rewritten
+        later with patch_many().
+        """
+        src_lines, tgt_lines, ids = [], [], []
+        for src, tgt, *rid in rows:
+            # 英文（可为空；是否显示由 set_show_source 控制）
+            if src:
+                src_lines.append(src)
+            # 中文：就算空也给一个占位，避免“看起来只有英文”
+            if tgt is None or not str(tgt).strip():
+                tgt = "[translating failed or empty]"
+            tgt_lines.append(tgt)
+            ids.append(rid[0] if rid else None)
+        self._append_lines(self.src_view, src_lines)
+        for rid, mark in zip(ids, self._append_lines(self.tgt_view, tgt_lines)):
+            self._tgt_rows += 1
+            if rid is not None:
+                self._pending[rid] = (mark, self._tgt_rows)
+        # 已经被 setMaximumBlockCount 挤掉的行不能再改
+        while self._pending and self._tgt_rows - next(iter(self._pending.values()))[1] >= self.max_lines:
+            self._pending.popitem(last=False)
+
+    def drop_pending(self):
+        # 会话结束：等译文的行不再接受改写，下个会话的同号结果只会追加
+        self._pending.clear()
+
+    def is_pending(self, rid) -> bool:
+        return rid in self._pending
+
+    def patch_many(self, patches: list):
+        """Replace the translation line of earlier rows: [(id, tgt)]; unknown ids are ignored."""
+        marks = [(self._pending.pop(rid)[0], tgt) for rid, tgt in patches if rid in self._pending]
+        if not marks:
+            return
+        cur = QTextCursor(self.tgt_view.document())
+        cur.beginEditBlock()
+        for mark, tgt in marks:
+            if tgt is None or not str(tgt).strip():
+                tgt = "[translating failed or empty]"
+            cur.setPosition(mark.block().position())
+            cur.movePosition(QTextCursor.MoveOperation.EndOfBlock, QTextCursor.MoveMode.KeepAnchor)
+            cur.insertText(str(tgt).rstrip("\n"))
+        cur.endEditBlock()
 
     def append(self, src: str, tgt: str):
-        # 英文（可为空；是否显示由 set_show_source 控制）
-        if src:
-            self._append_text(self.src_view, src)
-        # 中文：就算空也给一个占位，避免“看起来只有英文”
-        if tgt is None or not str(tgt).strip():
-            tgt = "[translating failed or empty]"
-        self._append_text(self.tgt_view, tgt)
+        self.append_many([(src, tgt)])
+
+    # ---------- 流式中间结果 ----------
+    def set_partial(self, utt, stable: str, unstable: str):
+        # 已稳定的词正常显示，未稳定的词灰色斜体
+        if not (stable or unstable):
+            self.clear_partial()
+            return
+        self.partial_utt = utt
+        html = html_escape(stable or "")
+        if unstable:
+            html += f' <span style="color:#94a3b8; font-style:italic">{html_escape(unstable)}</span>'
+        self.partial_view.setText(html)
+        self.partial_view.setVisible(True)
+
+    def clear_partial(self):
+        self.partial_utt = None
+        self.partial_view.clear()
+        self.partial_view.setVisible(False)
 
     # ---------- 自适应位置大小 ----------
     def resize_relative(self, w_ratio: float = 0.75, h_ratio: float = 0.10, bottom_margin: int = 20):
@@ -210,6 +314,9 @@ class Prefs(QDialog):
         idx = next((i for i,(c,_) in enumerate(LANGS) if c==self.data.get("target_lang","zh")), 0)
         self.cb_lang.setCurrentIndex(idx)
         form.addRow("Target Language:", self.cb_lang)
+        self.ed_extra_langs = QLineEdit(self.data.get("extra_target_langs",""))
+        self.ed_extra_langs.setPlaceholderText("e.g. JA, ES (one overlay each)")
+        form.addRow("Also translate to:", self.ed_extra_langs)
 
         self.sp_src = QSpinBox(); self.sp_src.setRange(10, 64); self.sp_src.setValue(int(self.data.get("font_size_src",18)))
         self.sp_tgt = QSpinBox(); self.sp_tgt.setRange(10, 72); self.sp_tgt.setValue(int(self.data.get("font_size_tgt",22)))
@@ -236,6 +343,40 @@ class Prefs(QDialog):
         self.btn_srt.clicked.connect(lambda: self._pick_path(self.ed_srt, "SubRip (*.srt);;All Files (*)"))
         row2 = QHBoxLayout(); row2.addWidget(self.chk_srt); row2.addWidget(self.ed_srt); row2.addWidget(self.btn_srt); form.addRow(row2)
 
+        self.chk_vtt = QCheckBox("Save captions to WebVTT"); self.chk_vtt.setChecked(bool(self.data.get("save_vtt", False)))
+        self.ed_vtt = QLineEdit(self.data.get("save_vtt_path",""))
+        self.btn_vtt = QPushButton("Browse…")
+        self.btn_vtt.clicked.connect(lambda: self._pick_path(self.ed_vtt, "WebVTT (*.vtt);;All Files (*)"))
+        row_vtt = QHBoxLayout(); row_vtt.addWidget(self.chk_vtt); row_vtt.addWidget(self.ed_vtt); row_vtt.addWidget(self.btn_vtt); form.addRow(row_vtt)
+
+        self.chk_jsonl = QCheckBox("Save JSONL (with word timings)"); self.chk_jsonl.setChecked(bool(self.data.get("save_jsonl", False)))
+        self.ed_jsonl = QLineEdit(self.data.get("save_jsonl_path",""))
+        self.btn_jsonl = QPushButton("Browse…")
+        self.btn_jsonl.clicked.connect(lambda: self._pick_path(self.ed_jsonl, "JSON Lines (*.jsonl);;All Files (*)"))
+        row_jsonl = QHBoxLayout(); row_jsonl.addWidget(self.chk_jsonl); row_jsonl.addWidget(self.ed_jsonl); row_jsonl.addWidget(self.btn_jsonl); form.addRow(row_jsonl)
+
+        # Audio input
+        from audio_source import SOURCE_KINDS
+        self.cb_source = QComboBox(); [self.cb_source.addItem(k, k) for k in SOURCE_KINDS]
+        sv = self.data.get("audio_source","device")
+        self.cb_source.setCurrentIndex(SOURCE_KINDS.index(sv) if sv in SOURCE_KINDS else 0)
+        form.addRow("Audio input:", self.cb_source)
+        self.ed_src_path = QLineEdit(self.data.get("audio_source_path",""))
+        self.btn_src_path = QPushButton("Browse…")
+        self.btn_src_path.clicked.connect(lambda: self._pick_open(self.ed_src_path, "Audio (*.wav *.pcm *.raw);;All Files (*)"))
+        row3 = QHBoxLayout(); row3.addWidget(self.ed_src_path); row3.addWidget(self.btn_src_path); form.addRow("Input file:", row3)
+        self.sp_port = QSpinBox(); self.sp_port.setRange(1024, 65535); self.sp_port.setValue(int(self.data.get("audio_source_port",5055)))
+        form.addRow("Input TCP port:", self.sp_port)
+        # 多路输入：每路自己的 VAD，字幕带说话人标签，解码按各路的延迟目标交错
+        self.sp_channels = QSpinBox(); self.sp_channels.setRange(1, 8); self.sp_channels.setValue(int(self.data.get("input_channels",1)))
+        self.ed_labels = QLineEdit(self.data.get("input_labels",""))
+        self.ed_labels.setPlaceholderText("Speaker labels, comma-separated (default Mic 1, Mic 2, …)")
+        self.sp_spk_lat = QDoubleSpinBox(); self.sp_spk_lat.setRange(0.5, 30.0); self.sp_spk_lat.setSingleStep(0.5); self.sp_spk_lat.setDecimals(1)
+        self.sp_spk_lat.setValue(float(self.data.get("speaker_latency_s",3.0)))
+        form.addRow("Inputs / channels:", self.sp_channels)
+        form.addRow("Speaker labels:", self.ed_labels)
+        form.addRow("Speaker latency target (s):", self.sp_spk_lat)
+
         # Advanced
         self.cb_device = QComboBox(); [self.cb_device.addItem(d, d) for d in ["cpu","cuda","auto"]]
         dv = self.data.get("device","cpu")
@@ -247,6 +388,16 @@ class Prefs(QDialog):
         self.cb_compute.setCurrentIndex(["int8","float32","float16"].index(cv) if cv in ["int8","float32","float16"] else 0)
         form.addRow("Compute Type:", self.cb_compute)
 
+        # 推理放到独立进程：解码不再和采集/VAD/Qt 抢 GIL
+        self.chk_asr_proc = QCheckBox("Run Whisper in a separate process")
+        self.chk_asr_proc.setChecked(bool(self.data.get("asr_process", False)))
+        form.addRow(self.chk_asr_proc)
+        self.sp_threads = QSpinBox(); self.sp_threads.setRange(0, 64); self.sp_threads.setSpecialValueText("auto")
+        self.sp_threads.setValue(int(self.data.get("cpu_threads",0)))
+        self.sp_workers = QSpinBox(); self.sp_workers.setRange(1, 8); self.sp_workers.setValue(int(self.data.get("num_workers",1)))
+        form.addRow("CPU threads:", self.sp_threads)
+        form.addRow("Decoder workers:", self.sp_workers)
+
         self.sp_min = QSpinBox(); self.sp_min.setRange(200, 3000); self.sp_min.setValue(int(self.data.get("min_chunk_ms",600)))
         self.sp_sil = QSpinBox(); self.sp_sil.setRange(100, 2000); self.sp_sil.setValue(int(self.data.get("max_sil_ms",350)))
         self.sp_vad = QDoubleSpinBox(); self.sp_vad.setRange(1.0, 8.0); self.sp_vad.setSingleStep(0.1); self.sp_vad.setValue(float(self.data.get("vad_thresh_mult",2.5)))
@@ -254,6 +405,67 @@ class Prefs(QDialog):
         form.addRow("Max silence (ms):", self.sp_sil)
         form.addRow("VAD threshold ×:", self.sp_vad)
 
+        # 第二道关：Silero 语音概率，咳嗽/键盘/掌声/音乐不送 Whisper
+        self.chk_gate = QCheckBox("Skip non-speech chunks (Silero VAD)")
+        self.chk_gate.setChecked(bool(self.data.get("speech_gate", True)))
+        self.sp_gate = QDoubleSpinBox(); self.sp_gate.setRange(0.05, 0.95); self.sp_gate.setSingleStep(0.05); self.sp_gate.setValue(float(self.data.get("speech_gate_threshold",0.5)))
+        form.addRow(self.chk_gate)
+        form.addRow("Speech probability ≥:", self.sp_gate)
+
+        # 自适应切分：上面两项是下限，这里是上限
+        self.chk_adaptive = QCheckBox("Adapt chunk length to decoding speed")
+        self.chk_adaptive.setChecked(bool(self.data.get("adaptive_chunking", False)))
+        self.sp_max_chunk = QSpinBox(); self.sp_max_chunk.setRange(200, 10000); self.sp_max_chunk.setSingleStep(100); self.sp_max_chunk.setValue(int(self.data.get("adaptive_max_chunk_ms",2400)))
+        self.sp_max_sil = QSpinBox(); self.sp_max_sil.setRange(100, 3000); self.sp_max_sil.setSingleStep(50); self.sp_max_sil.setValue(int(self.data.get("adaptive_max_sil_ms",700)))
+        form.addRow(self.chk_adaptive)
+        form.addRow("Adaptive max chunk (ms):", self.sp_max_chunk)
+        form.addRow("Adaptive max silence (ms):", self.sp_max_sil)
+
+        self.chk_stream = QCheckBox("Streaming partial captions (re-decode while speaking)")
+        self.chk_stream.setChecked(bool(self.data.get("streaming", False)))
+        self.sp_partial = QSpinBox(); self.sp_partial.setRange(200, 3000); self.sp_partial.setSingleStep(100); self.sp_partial.setValue(int(self.data.get("partial_interval_ms",500)))
+        form.addRow(self.chk_stream)
+        form.addRow("Partial interval (ms):", self.sp_partial)
+        self.chk_src_first = QCheckBox("Show source immediately, patch translation in place")
+        self.chk_src_first.setChecked(bool(self.data.get("source_first", True)))
+        form.addRow(self.chk_src_first)
+
+        # Pipeline：各级队列满了以后的处理方式
+        policies = ["merge", "drop_oldest", "drop_newest", "block"]
+        self.cb_overflow = QComboBox(); [self.cb_overflow.addItem(p, p) for p in policies]
+        ov = self.data.get("overflow_policy","merge")
+        self.cb_overflow.setCurrentIndex(policies.index(ov) if ov in policies else 0)
+        self.cb_overflow.setToolTip("block: the decoder waits for translation to catch up; audio capture never waits, "
+                                    "so chunks that do not fit are dropped (as drop_newest)")
+        form.addRow("Overflow policy:", self.cb_overflow)
+
+        # 过载保护：宁可少翻译/用小模型，也不让字幕落后几分钟
+        self.chk_shed = QCheckBox("Shed load when falling behind")
+        self.chk_shed.setChecked(bool(self.data.get("load_shedding", True)))
+        form.addRow(self.chk_shed)
+        def secs(key, default):
+            sp = QDoubleSpinBox(); sp.setRange(0.0, 600.0); sp.setSingleStep(1.0); sp.setDecimals(1)
+            sp.setSpecialValueText("off"); sp.setValue(float(self.data.get(key, default)))
+            return sp
+        self.sp_stale = secs("stale_deadline_s", 20.0)
+        self.sp_skip_tr = secs("skip_translate_lag_s", 8.0)
+        self.sp_fb_lag = secs("fallback_lag_s", 12.0)
+        self.ed_fb_model = QLineEdit(self.data.get("fallback_model","tiny.en"))
+        form.addRow("Drop chunks older than (s):", self.sp_stale)
+        form.addRow("Source only when behind (s):", self.sp_skip_tr)
+        form.addRow("Fallback model:", self.ed_fb_model)
+        form.addRow("Use fallback when behind (s):", self.sp_fb_lag)
+        # 每批翻译的时间预算：过半还没回来就同时问 MyMemory，到点没回来就只显示原文
+        self.sp_budget = secs("translate_budget_s", 4.0)
+        form.addRow("Translation budget (s):", self.sp_budget)
+        # 整句翻译：碎片攒到句末（或最多等这么久）再一起翻
+        self.chk_coalesce = QCheckBox("Translate whole sentences (with context)")
+        self.chk_coalesce.setChecked(bool(self.data.get("coalesce_sentences", True)))
+        self.sp_coalesce = QDoubleSpinBox(); self.sp_coalesce.setRange(0.5, 10.0); self.sp_coalesce.setSingleStep(0.5); self.sp_coalesce.setDecimals(1)
+        self.sp_coalesce.setValue(float(self.data.get("coalesce_max_delay_s", 2.5)))
+        form.addRow(self.chk_coalesce)
+        form.addRow("Wait for sentence end up to (s):", self.sp_coalesce)
+
         btns = QDialogButtonBox(QDialogButtonBox.StandardButton.Save | QDialogButtonBox.StandardButton.Cancel)
         btns.accepted.connect(self.accept); btns.rejected.connect(self.reject)
         form.addRow(btns)
@@ -262,10 +474,15 @@ class Prefs(QDialog):
         path,_ = QFileDialog.getSaveFileName(self, "Choose File", "", filter_str)
         if path: line.setText(path)
 
+    def _pick_open(self, line: QLineEdit, filter_str: str):
+        path,_ = QFileDialog.getOpenFileName(self, "Choose File", "", filter_str)
+        if path: line.setText(path)
+
     def values(self):
         return dict(
             deepl_key=self.ed_key.text().strip(),
             target_lang=self.cb_lang.currentData(),
+            extra_target_langs=self.ed_extra_langs.text().strip(),
             font_size_src=int(self.sp_src.value()),
             font_size_tgt=int(self.sp_tgt.value()),
             max_lines=int(self.sp_lines.value()),
@@ -274,13 +491,88 @@ class Prefs(QDialog):
             save_txt_path=self.ed_txt.text().strip(),
             save_srt=bool(self.chk_srt.isChecked()),
             save_srt_path=self.ed_srt.text().strip(),
+            save_vtt=bool(self.chk_vtt.isChecked()),
+            save_vtt_path=self.ed_vtt.text().strip(),
+            save_jsonl=bool(self.chk_jsonl.isChecked()),
+            save_jsonl_path=self.ed_jsonl.text().strip(),
+            audio_source=self.cb_source.currentData(),
+            audio_source_path=self.ed_src_path.text().strip(),
+            audio_source_port=int(self.sp_port.value()),
+            input_channels=int(self.sp_channels.value()),
+            input_labels=self.ed_labels.text().strip(),
+            speaker_latency_s=float(self.sp_spk_lat.value()),
             device=self.cb_device.currentData(),
             compute_type=self.cb_compute.currentData(),
+            asr_process=bool(self.chk_asr_proc.isChecked()),
+            cpu_threads=int(self.sp_threads.value()),
+            num_workers=int(self.sp_workers.value()),
             min_chunk_ms=int(self.sp_min.value()),
             max_sil_ms=int(self.sp_sil.value()),
-            vad_thresh_mult=float(self.sp_vad.value())
+            vad_thresh_mult=float(self.sp_vad.value()),
+            speech_gate=bool(self.chk_gate.isChecked()),
+            speech_gate_threshold=float(self.sp_gate.value()),
+            adaptive_chunking=bool(self.chk_adaptive.isChecked()),
+            adaptive_max_chunk_ms=int(self.sp_max_chunk.value()),
+            adaptive_max_sil_ms=int(self.sp_max_sil.value()),
+            overflow_policy=self.cb_overflow.currentData(),
+            load_shedding=bool(self.chk_shed.isChecked()),
+            stale_deadline_s=float(self.sp_stale.value()),
+            skip_translate_lag_s=float(self.sp_skip_tr.value()),
+            fallback_model=self.ed_fb_model.text().strip(),
+            fallback_lag_s=float(self.sp_fb_lag.value()),
+            translate_budget_s=float(self.sp_budget.value()),
+            coalesce_sentences=bool(self.chk_coalesce.isChecked()),
+            coalesce_max_delay_s=float(self.sp_coalesce.value()),
+            streaming=bool(self.chk_stream.isChecked()),
+            partial_interval_ms=int(self.sp_partial.value()),
+            source_first=bool(self.chk_src_first.isChecked())
         )
 
+# ================= 结果投递：引擎线程 -> Qt 线程 =================
+class OutputQueue(queue.Queue):
+    """
+    queue.Queue that calls `notify()` once per burst: the first put after the
+    consumer called rearm(). The consumer rearms before draining, so an item
+    put during a drain triggers one more notification and is never missed.
+    """
+    def __init__(self, notify):
+        super().__init__()
+        self.notify = notify
+        self._armed = True
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        with self.mutex:
+            fire, self._armed = self._armed, False
+        if fire:
+            self.notify()
+
+    def rearm(self):
+        with self.mutex:
+            self._armed = True
+
+
+class ResultBridge(QObject):
+    # 从任意线程 emit，排队连接到 Qt 线程的槽
+    ready = pyqtSignal()
+
+# ================= 后台加载模型（跨线程信号回到 Qt 线程） =================
+class ModelLoader(QObject):
+    progress = pyqtSignal(str)
+    done = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def load(self, spec: dict):
+        def work():
+            try:
+                import asr_engine, model_cache  # 首次 Start：重模块也在这个线程里导入
+                m = model_cache.get_model(progress=self.progress.emit, **spec)
+            except Exception as e:
+                self.failed.emit(str(e))
+                return
+            self.done.emit(m)
+        threading.Thread(target=work, daemon=True).start()
+
 # ================= 主窗口：英雄卡片 + 大按钮 + 摘要 =================
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -290,8 +582,12 @@ class MainWindow(QMainWindow):
         self.setStyleSheet(STYLE)
 
         self.data = load_settings()
-        self.output_q = queue.Queue()
+        # 引擎有结果时通过排队信号唤醒 UI；一次唤醒取完整批，空闲时没有任何定时轮询
+        self.bridge = ResultBridge(self)
+        self.bridge.ready.connect(self._drain, Qt.ConnectionType.QueuedConnection)
+        self.output_q = OutputQueue(self.bridge.ready.emit)
         self.engine = None
+        self.translation_cache = None  # 跨 Start/Stop 复用，首次 Start 时创建
 
         # 悬浮字幕
         self.overlay = Overlay(
@@ -310,6 +606,7 @@ class MainWindow(QMainWindow):
         self.act_stop  = QAction("Stop", self);  self.act_stop.triggered.connect(self.stop);  m.addAction(self.act_stop)
         m.addSeparator()
         act_overlay = QAction("Toggle Overlay", self); act_overlay.triggered.connect(self.toggle_overlay); m.addAction(act_overlay)
+        act_unload = QAction("Unload Cached Models", self); act_unload.triggered.connect(self.unload_models); m.addAction(act_unload)
 
         # 快捷键
         QShortcut(QKeySequence("Ctrl+P"), self, activated=self.show_prefs)
@@ -369,14 +666,31 @@ class MainWindow(QMainWindow):
         hero_lay.addLayout(btn_row)
         hero_lay.addWidget(self.lbl_summary)
 
+        # 运行统计：各环节耗时 + 队列深度，运行时每秒刷新
+        self.lbl_stats = QLabel(objectName="Stats")
+        self.lbl_stats.setTextFormat(Qt.TextFormat.PlainText)
+        self.lbl_stats.setVisible(False)
+        hero_lay.addWidget(self.lbl_stats)
+
         root.addWidget(hero)
         self.setCentralWidget(central)
 
-        # 状态栏+队列轮询
-        self.txt_writer = None
-        self.srt_writer = None
-        self.timer = QTimer(self); self.timer.setInterval(50)
-        self.timer.timeout.connect(self._drain); self.timer.start()
+        # 其他目标语言各自的悬浮窗（主语言用 self.overlay），以及每种语言的字幕文件
+        self.lang_overlays = {}
+        self.langs = []
+        self.writers = {}
+        self.metrics = None
+        self.loading = False
+        self.loader = ModelLoader(self)
+        self.loader.progress.connect(lambda msg: self.statusBar().showMessage(msg))
+        self.loader.done.connect(self._on_model_ready)
+        self.loader.failed.connect(self._on_model_failed)
+        self.stats_timer = QTimer(self); self.stats_timer.setInterval(1000)
+        self.stats_timer.timeout.connect(self._refresh_stats)
+
+        # 首帧之后再在后台导入重模块，Start 时基本不用再等
+        if self.data.get("prefetch_imports", True):
+            QTimer.singleShot(0, lambda: threading.Thread(target=prefetch_modules, daemon=True).start())
 
         # 初始按钮状态
         self._update_controls(running=False)
@@ -389,7 +703,7 @@ class MainWindow(QMainWindow):
     def _refresh_summary_text(self):
         d = self.data
         parts = [
-            f"Target: {d.get('target_lang','zh')}",
+            f"Target: {', '.join(x for x in [d.get('target_lang','zh'), d.get('extra_target_langs','')] if x)}",
             f"Model: {d.get('model_name','base.en')}",
             f"Device: {d.get('device','cpu')}/{d.get('compute_type','int8')}",
             f"Chunk: {d.get('min_chunk_ms',600)}ms · Silence {d.get('max_sil_ms',350)}ms · VAD×{d.get('vad_thresh_mult',2.5)}",
@@ -399,12 +713,59 @@ class MainWindow(QMainWindow):
         ]
         self.lbl_summary.setText(" · ".join(parts))
 
+    def _refresh_stats(self):
+        if not (self.engine and self.metrics):
+            return
+        depths = self.engine.queue_depths()
+        depths["output_q"] = self.output_q.qsize()
+        self.metrics.gauge(depths, self.engine.counters())
+        snap = self.metrics.snapshot()
+        lines = [f"{'stage (ms)':<12}{'p50':>8}{'p95':>8}{'max':>8}{'n':>6}"]
+        for name, h in snap["stages"].items():
+            lines.append(f"{name:<12}{h['p50']:>8.0f}{h['p95']:>8.0f}{h['max']:>8.0f}{h['n']:>6}")
+        lines.append("queues: " + "  ".join(f"{k}={v}" for k, v in snap["depths"].items()))
+        c = snap["counters"]
+        lines.append(
+            f"DeepL {c['deepl_calls']} calls / {c['deepl_errors']} errors · MyMemory {c['fallback_calls']} "
+            f"({c['fallback_s']}s) · chunks dropped {c['chunks_dropped']} merged {c['chunks_merged']} "
+            f"stale {c['stale_chunks']} · overruns {c['overruns']}"
+        )
+        lines.append(
+            f"translation: hedged {c['hedged']} · retried {c['retries']} · timeouts {c['deepl_timeouts']} · "
+            f"over budget {c['budget_exceeded']} · breakers DeepL {c['deepl_breaker']} ({c['deepl_breaker_opens']}×) "
+            f"MyMemory {c['mymemory_breaker']} ({c['mymemory_breaker_opens']}×)"
+        )
+        if "lag_s" in c:
+            lines.append(f"load: lag {c['lag_s']}s · stale dropped {c['shed_stale']} · source-only "
+                         f"{c['shed_untranslated']}" + (" · FALLBACK MODEL" if c["fallback_active"] else ""))
+        if "gate_rejected" in c:
+            lines.append(f"speech gate: {c['gate_rejected']} non-speech chunks skipped · ~{c['gate_saved_s']}s decode saved")
+        if "coalesced_groups" in c:
+            lines.append(f"sentences: {c['coalesced_fragments']} fragments sent as {c['coalesced_groups']} translations")
+        if "chunk_ms" in c:
+            lines.append(f"adaptive: RTF {c['rtf']} · min chunk {c['chunk_ms']} ms · silence cut {c['sil_ms']} ms")
+        spk = [k[len("served_"):] for k in c if k.startswith("served_")]
+        if spk:
+            lines.append("speakers: " + " · ".join(f"{k} {c['served_' + k]} chunks ({c['late_' + k]} late)" for k in spk))
+        if c.get("asr_restarts") or c.get("asr_lost"):
+            lines.append(f"ASR worker restarts {c['asr_restarts']} · lost requests {c['asr_lost']}")
+        self.lbl_stats.setText("\n".join(lines))
+
     def show_prefs(self):
         dlg = Prefs(self.data)
         if dlg.exec():
-            self.data = save_settings(dlg.values())
+            # 保留对话框里没有的键（model_name、队列大小等），不要被默认值覆盖
+            self.data = save_settings({**self.data, **dlg.values()})
+            model_cache = sys.modules.get("model_cache")
+            if model_cache and not (self.engine or self.loading):
+                # 换了模型/设备：旧模型不会再用，释放内存
+                model_cache.evict(keep=model_cache.model_key(**self._model_spec()))
             self.overlay.set_show_source(self.data.get("show_source", True))
             self.overlay.set_fonts(self.data.get("font_size_src", 18), self.data.get("font_size_tgt", 22))
+            self.overlay.set_max_lines(self.data.get("max_lines", 10))
+            for ov in self.lang_overlays.values():
+                ov.set_fonts(self.data.get("font_size_src", 18), self.data.get("font_size_tgt", 22))
+                ov.set_max_lines(self.data.get("max_lines", 10))
             self._refresh_summary_text()
             self.statusBar().showMessage("Preferences saved", 2000)
 
@@ -412,75 +773,279 @@ class MainWindow(QMainWindow):
         if not self.data.get("deepl_key"):
             QMessageBox.warning(self, "Missing API Key", "请在 Preferences 里填写 DeepL API Key")
             return
-        if self.engine:
+        if self.engine or self.loading:
+            return
+        kind = self.data.get("audio_source","device")
+        if kind == "file" and not os.path.isfile(self.data.get("audio_source_path","")):
+            QMessageBox.warning(self, "Missing input file", "请在 Preferences 里选择要回放的音频文件")
             return
 
-        # writers
-        if self.data.get("save_txt") and self.data.get("save_txt_path"):
-            self.txt_writer = TxtWriter(self.data["save_txt_path"]); self.txt_writer.open()
-        else:
-            self.txt_writer = None
-        if self.data.get("save_srt") and self.data.get("save_srt_path"):
-            self.srt_writer = SrtWriter(self.data["save_srt_path"], session_start_monotonic=time.monotonic())
-            self.srt_writer.open()
-        else:
-            self.srt_writer = None
+        # 模型在后台线程加载/预热（已缓存则立即返回），好了再开会话，UI 不卡
+        self.loading = True
+        self._update_controls(running=True)
+        self.loader.load(self._model_spec())
+
+    def _model_spec(self) -> dict:
+        # model_cache.get_model / model_key 的参数
+        return dict(
+            model_name=self.data.get("model_name","base.en"),
+            device=self.data.get("device","cpu"),
+            compute_type=self.data.get("compute_type","int8"),
+            cpu_threads=int(self.data.get("cpu_threads",0)),
+            num_workers=int(self.data.get("num_workers",1)),
+            out_of_process=bool(self.data.get("asr_process", False))
+        )
+
+    def _on_model_failed(self, err: str):
+        self.loading = False
+        self._update_controls(running=False)
+        self.statusBar().clearMessage()
+        QMessageBox.critical(self, "Model load failed", err)
+
+    def _on_model_ready(self, model):
+        if not self.loading:
+            return  # 加载期间点了 Stop：模型留在缓存里，下次直接用
+        self.loading = False
+        from asr_engine import AsrEngine, deepl_api_base, parse_target_langs
+        from audio_source import make_sources
+        from translation_cache import TranslationCache, CACHE_DB_PATH
+        from metrics import PipelineMetrics
+
+        # audio input(s)：多路时每路一个说话人
+        kind = self.data.get("audio_source","device")
+        sources = make_sources(
+            kind, path=self.data.get("audio_source_path",""),
+            port=int(self.data.get("audio_source_port",5055)),
+            device=self.data.get("input_device") or None,
+            channels=int(self.data.get("input_channels",1))
+        )
+        labels = [l.strip() for l in self.data.get("input_labels","").split(",")]
+
+        # 目标语言：主语言 + 其他语言（识别只做一次，翻译按语言分发）
+        self.langs = parse_target_langs([self.data.get("target_lang","zh")] +
+                                        self.data.get("extra_target_langs","").split(","))
+        self._setup_lang_overlays(self.langs[1:])
+
+        # writers：每种语言一组，后台线程批量写，停止时原子落盘；其他语言的文件名带语言后缀
+        t0 = time.monotonic()
+        self.writers = {}
+        for i, lang in enumerate(self.langs):
+            files = [cls(self.data[f"save_{fmt}_path"] if i == 0 else lang_path(self.data[f"save_{fmt}_path"], lang),
+                         session_start_monotonic=t0) for fmt, cls in WRITERS.items()
+                     if self.data.get(f"save_{fmt}") and self.data.get(f"save_{fmt}_path")]
+            if files:
+                self.writers[lang] = AsyncCaptionWriter(files, float(self.data.get("writer_flush_s", 1.0)),
+                                                        float(self.data.get("writer_pending_timeout_s", 15.0)))
+                self.writers[lang].open()
+
+        # translation cache (memory LRU + optional SQLite)
+        if self.translation_cache is None:
+            self.translation_cache = TranslationCache(
+                max_items=int(self.data.get("translation_cache_size",2000)),
+                ttl_s=float(self.data.get("translation_cache_ttl_s",604800)),
+                db_path=CACHE_DB_PATH if self.data.get("translation_cache_disk", True) else None
+            )
+
+        self.metrics = PipelineMetrics(jsonl_path=self.data.get("metrics_jsonl_path",""))
 
         # engine
         self.engine = AsrEngine(
             output_q=self.output_q,
             deepl_key=self.data["deepl_key"],
-            target_lang=self.data.get("target_lang","zh"),
+            target_lang=self.langs,
             model_name=self.data.get("model_name","base.en"),
             device=self.data.get("device","cpu"),
             compute_type=self.data.get("compute_type","int8"),
             min_chunk_ms=int(self.data.get("min_chunk_ms",600)),
             max_sil_ms=int(self.data.get("max_sil_ms",350)),
             vad_thresh_mult=float(self.data.get("vad_thresh_mult",2.5)),
-            api_base="https://api-free.deepl.com" if self.data.get("deepl_key","").endswith(":fx") else "https://api.deepl.com"
+            speech_gate=bool(self.data.get("speech_gate", True)),
+            speech_gate_threshold=float(self.data.get("speech_gate_threshold",0.5)),
+            speech_gate_min_ms=int(self.data.get("speech_gate_min_ms",250)),
+            adaptive_chunking=bool(self.data.get("adaptive_chunking", False)),
+            max_chunk_ms=int(self.data.get("adaptive_max_chunk_ms",2400)),
+            max_sil_ms_max=int(self.data.get("adaptive_max_sil_ms",700)),
+            api_base=deepl_api_base(self.data.get("deepl_key","")),
+            chunk_queue_size=int(self.data.get("chunk_queue_size",4)),
+            caption_queue_size=int(self.data.get("caption_queue_size",32)),
+            overflow_policy=self.data.get("overflow_policy","merge"),
+            load_shedding=bool(self.data.get("load_shedding", True)),
+            stale_deadline_s=float(self.data.get("stale_deadline_s",20.0)),
+            skip_translate_lag_s=float(self.data.get("skip_translate_lag_s",8.0)),
+            fallback_model=self.data.get("fallback_model","tiny.en"),
+            fallback_lag_s=float(self.data.get("fallback_lag_s",12.0)),
+            recover_lag_s=float(self.data.get("recover_lag_s",2.0)),
+            recover_hold_s=float(self.data.get("recover_hold_s",30.0)),
+            translate_workers=int(self.data.get("translate_workers",4)),
+            translate_budget_s=float(self.data.get("translate_budget_s",4.0)),
+            breaker_failures=int(self.data.get("breaker_failures",3)),
+            breaker_cooldown_s=float(self.data.get("breaker_cooldown_s",30.0)),
+            translation_cache=self.translation_cache,
+            streaming=bool(self.data.get("streaming", False)),
+            partial_interval_ms=int(self.data.get("partial_interval_ms",500)),
+            source_first=bool(self.data.get("source_first", True)),
+            coalesce_sentences=bool(self.data.get("coalesce_sentences", True)),
+            coalesce_max_delay_s=float(self.data.get("coalesce_max_delay_s", 2.5)),
+            source=sources,
+            input_labels=labels,
+            latency_targets_s=float(self.data.get("speaker_latency_s",3.0)),
+            # 每路串行解码，多个解码线程只在多路之间并行（模型需 num_workers 个 worker）
+            asr_workers=min(len(sources), int(self.data.get("num_workers",1))),
+            model=model
         )
         self.engine.start()
-        self.overlay.resize_relative(0.75, 0.10)  # 75%×10% 自适应
-        self.overlay.show()
+        self.lbl_stats.setVisible(True)
+        self.stats_timer.start()
+        self._show_overlays()
         self._update_controls(running=True)
         self.statusBar().showMessage("Running…", 3000)
 
     def stop(self):
+        self.loading = False
         if self.engine:
             self.engine.stop()
             self.engine = None
-        if self.txt_writer:
-            self.txt_writer.close(); self.txt_writer = None
-        if self.srt_writer:
-            self.srt_writer.close(); self.srt_writer = None
+        self.overlay.clear_partial()
+        for ov in (self.overlay, *self.lang_overlays.values()):
+            ov.drop_pending()
+        self.stats_timer.stop()
+        if self.metrics:
+            self.metrics.close(); self.metrics = None
+        errors = []
+        for w in self.writers.values():
+            w.close(); errors += w.errors
+        self.writers = {}
         self._update_controls(running=False)
-        self.statusBar().showMessage("Stopped.", 2000)
+        msg = "Stopped."
+        if errors:
+            QMessageBox.warning(self, "Saving captions failed", "\n".join(errors))
+        if self.translation_cache:
+            st = self.translation_cache.stats()
+            msg += f"  Translation cache: {st['hits'] + st['disk_hits']} hits / {st['misses']} misses"
+        self.statusBar().showMessage(msg, 4000)
+
+    def unload_models(self):
+        model_cache = sys.modules.get("model_cache")
+        if model_cache is None:
+            self.statusBar().showMessage("No models loaded.", 3000)
+            return
+        # 正在运行的会话用到的模型保留
+        keep = None
+        if self.engine or self.loading:
+            keep = model_cache.model_key(**self._model_spec())
+        n = model_cache.evict(keep=keep)
+        self.statusBar().showMessage(f"Unloaded {n} cached model(s).", 3000)
+
+    def _setup_lang_overlays(self, langs: list):
+        # 每种其他语言一个只显示译文的悬浮窗；不再用的关掉
+        for lang in [l for l in self.lang_overlays if l not in langs]:
+            self.lang_overlays.pop(lang).close()
+        for lang in langs:
+            if lang not in self.lang_overlays:
+                ov = Overlay(self.data.get("max_lines",10), self.data.get("font_size_src",18),
+                             self.data.get("font_size_tgt",22))
+                ov.setWindowTitle(f"GuiLiveSubs Overlay ({lang})")
+                ov.set_show_source(False)
+                self.lang_overlays[lang] = ov
+
+    def _show_overlays(self):
+        # 主语言在最下面（75%×10% 自适应），其他语言依次往上叠
+        self.overlay.resize_relative(0.75, 0.10)
+        self.overlay.show()
+        for k, ov in enumerate(self.lang_overlays.values(), 1):
+            ov.resize_relative(0.75, 0.10, 20 + k * (self.overlay.height() + 10))
+            ov.show()
 
     def toggle_overlay(self):
         if self.overlay.isVisible():
             self.overlay.hide()
+            for ov in self.lang_overlays.values():
+                ov.hide()
         else:
-            self.overlay.resize_relative(0.75, 0.10)
-            self.overlay.show()
+            self._show_overlays()
 
     def _drain(self):
-        # 从引擎队列取出识别/翻译结果并显示，写入 TXT/SRT
+        # 从引擎队列取出识别/翻译结果，这一轮取到的字幕按语言合并成每个 overlay 一次更新；写入字幕文件
+        if not self.langs:
+            return
+        primary = self.langs[0]
+        views = {primary: self.overlay, **self.lang_overlays}
+        rows = {lang: [] for lang in views}
+        patches = {lang: [] for lang in views}
+        row_of = {lang: {} for lang in views}  # 这一轮刚排进 rows 的原文行：id -> 下标
+        rendered, sources = [], []
+        self.output_q.rearm()
         try:
             while True:
                 item = self.output_q.get_nowait()
+                kind = item.get("type")
+                if kind == "partial":
+                    if self.data.get("show_source", True):
+                        self.overlay.set_partial(item.get("utt"), item.get("stable",""), item.get("unstable",""))
+                    continue
+                # 定稿（或原文先行）字幕到了：它覆盖的中间结果行可以撤掉
+                pu = self.overlay.partial_utt
+                if pu is not None and item.get("utt_end", -1) > pu:
+                    self.overlay.clear_partial()
                 st = item.get("start",0.0)
                 et = item.get("end",0.0)
 
                 show_src = self.data.get("show_source", True)
                 src_line = item.get("src", "") if show_src else ""
-                tgt_line = item.get("tgt", None)  # 允许 None，Overlay 会做占位
+                words = item.get("words") if src_line else None
+                rid = item.get("id")
+                speaker = item.get("speaker", "")
+                tag = f"{speaker}: " if speaker else ""  # 说话人标签放在这一行的第一段文字前
 
-                self.overlay.append(src_line, tgt_line)
+                if kind == "source":
+                    # 原文先上屏（只在主悬浮窗），各语言的译文位置先放“…”，等同 id 的定稿回来再原地改写
+                    for lang in views:
+                        row_of[lang][rid] = len(rows[lang])
+                        rows[lang].append((tag + src_line, "…", rid) if lang == primary and src_line else ("", tag + "…", rid))
+                    sources.append(item)
+                    for w in self.writers.values():
+                        w.write_source({"id": rid, "src": src_line, "start": st, "end": et, "words": words,
+                                        "speaker": speaker})
+                    continue
+
+                lang = item.get("lang") or primary
+                if lang not in views:
+                    continue
+                tgt_line = item.get("tgt", None)  # 允许 None，Overlay 会做占位
+                # 过载降级的字幕没有译文：屏幕上给个“追赶中”的记号，文件里留空
+                shown = "…" if item.get("shed") else tgt_line
+                line_src = src_line if lang == primary else ""
+                if line_src:
+                    line_src = tag + line_src
+                elif shown:
+                    shown = tag + shown
+                if rid in row_of[lang]:
+                    rows[lang][row_of[lang].pop(rid)] = (line_src, shown)
+                elif rid is not None and views[lang].is_pending(rid):
+                    patches[lang].append((rid, shown))
+                else:
+                    rows[lang].append((line_src, shown))
+                if lang == primary:
+                    rendered.append(item)
 
-                if self.txt_writer:
-                    self.txt_writer.write_line(src_line, tgt_line or "")
-                if self.srt_writer:
-                    self.srt_writer.write_caption(st, et, src_line, tgt_line or "")
+                w = self.writers.get(lang)
+                if w:
+                    w.write({"id": rid, "src": src_line, "tgt": tgt_line or "", "start": st, "end": et,
+                             "words": words, "speaker": speaker})
         except Exception:
             # 队列为空即退出
             pass
+        for lang, ov in views.items():
+            if rows[lang]:
+                ov.append_many(rows[lang])
+            if patches[lang]:
+                ov.patch_many(patches[lang])
+        if (sources or rendered) and self.metrics:
+            now = time.monotonic()
+            for item in sources:
+                if "t" in item:
+                    item["t"]["src_render"] = now
+            for item in rendered:
+                if "t" in item:
+                    item["t"]["render"] = now
+                    self.metrics.observe(item)
@@ -0,0 +1,197 @@
+import time, threading, multiprocessing as mp
+from multiprocessing import shared_memory
+from types import SimpleNamespace
+import numpy as np
+
+SR = 16000
+
+
+# ---------- 子进程 ----------
+def _pack_segment(s) -> SimpleNamespace:
+    # faster-whisper 的 Segment/Word 换成可 pickle 的轻量对象，只留下游用得到的字段
+    words = getattr(s, "words", None)
+    if words:
+        words = [SimpleNamespace(word=w.word, start=w.start, end=w.end,
+                                 probability=getattr(w, "probability", None)) for w in words]
+    return SimpleNamespace(text=s.text, start=s.start, end=s.end, words=words or None,
+                           avg_logprob=getattr(s, "avg_logprob", None),
+                           no_speech_prob=getattr(s, "no_speech_prob", None))
+
+
+def _worker_main(conn, model_name, device, compute_type, cpu_threads, num_workers):
+    """Worker process: load the model, then serve (shm_name, n_samples, kwargs) requests over `conn`."""
+    try:
+        from faster_whisper import WhisperModel
+        model = WhisperModel(model_name, device=device, compute_type=compute_type,
+                             cpu_threads=cpu_threads, num_workers=num_workers)
+        list(model.transcribe(np.zeros(SR, dtype=np.float32), beam_size=1, language="en")[0])
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready", None))
+    shm = None
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            break
+        if msg is None:
+            break
+        name, n, kw = msg
+        if shm is None or shm.name != name:
+            if shm is not None:
+                shm.close()
+            shm = shared_memory.SharedMemory(name=name)
+        audio = np.ndarray((n,), dtype=np.float32, buffer=shm.buf)
+        try:
+            segments, info = model.transcribe(audio, **kw)
+            segs = [_pack_segment(s) for s in segments]
+            info = SimpleNamespace(language=getattr(info, "language", None),
+                                   language_probability=getattr(info, "language_probability", None),
+                                   duration=getattr(info, "duration", n / SR))
+            conn.send(("ok", (segs, info)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+        finally:
+            del audio  # 先释放视图，shm 才能 close
+    if shm is not None:
+        shm.close()
+
+
+# ---------- 主进程侧 ----------
+class WhisperProcess:
+    """
+    WhisperModel stand-in whose transcribe() runs in a dedicated worker process,
+    so decoding never holds the GIL of the process that runs capture, VAD and Qt.
+    Audio goes through a shared-memory buffer (grown on demand); only the
+    buffer name, length and decode options are pickled. A watchdog thread
+    respawns the worker if it dies; a request that hangs longer than
+    `timeout_s` + 2 × audio length kills it. A request lost to a crash returns
+    no segments. One request at a time, like a single WhisperModel.
+    """
+    def __init__(self, model_name="base.en", device="cpu", compute_type="int8",
+                 cpu_threads=0, num_workers=1, buffer_s=60, timeout_s=30.0, load_timeout_s=600.0):
+        self.args = (model_name, device, compute_type, int(cpu_threads), max(1, int(num_workers)))
+        self.timeout_s = float(timeout_s)
+        self.load_timeout_s = float(load_timeout_s)
+        self.restarts = 0       # watchdog 重启次数
+        self.lost_requests = 0  # 因崩溃/超时没有结果的请求
+        self._ctx = mp.get_context("spawn")  # 不 fork 带着 Qt/PortAudio 线程的进程
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._closed = threading.Event()
+        self._proc = None
+        self._conn = None
+        self._shm = shared_memory.SharedMemory(create=True, size=int(buffer_s * SR) * 4)
+        self._watchdog = None
+
+    # 生命周期
+    def start(self, progress=None):
+        """Spawn the worker and block until its model is loaded (raises RuntimeError on failure)."""
+        if progress:
+            progress(f"Starting {self.args[0]} worker process…")
+        try:
+            self._spawn()
+        except Exception:
+            self.close()
+            raise
+        self._watchdog = threading.Thread(target=self._watch, daemon=True)
+        self._watchdog.start()
+        return self
+
+    def _spawn(self):
+        self._ready.clear()
+        parent, child = self._ctx.Pipe()
+        proc = self._ctx.Process(target=_worker_main, args=(child,) + self.args, daemon=True,
+                                 name="whisper-worker")
+        proc.start()
+        child.close()
+        t_end = time.monotonic() + self.load_timeout_s
+        while not parent.poll(0.2):
+            if not proc.is_alive() or time.monotonic() > t_end or self._closed.is_set():
+                proc.kill()
+                raise RuntimeError("Whisper worker failed to start")
+        kind, payload = parent.recv()
+        if kind != "ready":
+            proc.join(timeout=5)
+            raise RuntimeError(payload)
+        self._proc, self._conn = proc, parent
+        self._ready.set()
+
+    def _watch(self):
+        while not self._closed.wait(0.5):
+            proc = self._proc
+            if proc is None or proc.is_alive():
+                continue
+            self._ready.clear()
+            self.restarts += 1
+            if self._conn is not None:
+                self._conn.close()
+            try:
+                self._spawn()
+            except RuntimeError:
+                time.sleep(2.0)  # 模型本身加载不了：别疯狂重试
+
+    def close(self):
+        self._closed.set()
+        self._ready.clear()
+        proc, conn = self._proc, self._conn
+        self._proc = self._conn = None
+        if conn is not None:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+        if proc is not None:
+            proc.join(timeout=3)
+            if proc.is_alive():
+                proc.kill()
+        if conn is not None:
+            conn.close()
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.is_alive()
+
+    # 推理
+    def _buffer(self, n: int) -> shared_memory.SharedMemory:
+        if n * 4 > self._shm.size:
+            # 放不下：换一块更大的，子进程按名字重新映射
+            old = self._shm
+            self._shm = shared_memory.SharedMemory(create=True, size=n * 4 * 2)
+            old.close()
+            old.unlink()
+        return self._shm
+
+    def transcribe(self, audio, **kw):
+        audio = np.asarray(audio, dtype=np.float32)
+        n = len(audio)
+        with self._lock:
+            if self._closed.is_set() or not self._ready.wait(self.load_timeout_s):
+                self.lost_requests += 1
+                return iter([]), None
+            shm = self._buffer(n)
+            np.copyto(np.ndarray((n,), dtype=np.float32, buffer=shm.buf), audio)
+            conn, proc = self._conn, self._proc
+            deadline = time.monotonic() + self.timeout_s + 2.0 * n / SR
+            try:
+                conn.send((shm.name, n, kw))
+                while not conn.poll(0.1):
+                    if not proc.is_alive():
+                        raise EOFError
+                    if time.monotonic() > deadline:
+                        proc.kill()  # 卡死：杀掉，交给 watchdog 重启
+                        raise EOFError
+                kind, payload = conn.recv()
+            except (EOFError, OSError):
+                self._ready.clear()
+                self.lost_requests += 1
+                return iter([]), None
+        if kind != "ok":
+            raise RuntimeError(payload)
+        segments, info = payload
+        return iter(segments), info
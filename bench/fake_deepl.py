@@ -0,0 +1,88 @@
+"""
+Local stand-in for the DeepL /v2/translate and MyMemory /get endpoints, so the
+benchmarks run with no network. Latency and failures are configurable.
+"""
+import json, random, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class _QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        pass  # 客户端超时/对冲后放弃的请求会断开连接，不打印
+
+
+class FakeTranslator:
+    def __init__(self, latency_ms: float = 150.0, jitter_ms: float = 50.0, fail_rate: float = 0.0,
+                 fallback_latency_ms: float = 300.0, seed: int = 0):
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.fail_rate = float(fail_rate)
+        self.fallback_latency = fallback_latency_ms / 1000.0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.fallback_calls = 0
+        self.failures = 0
+        self.chars = 0
+        self._server = None
+
+    def _delay(self, base: float):
+        with self._lock:
+            d = max(0.0, base + self._rng.uniform(-self.jitter, self.jitter))
+            fail = self._rng.random() < self.fail_rate
+        time.sleep(d)
+        return fail
+
+    def start(self) -> str:
+        """Start serving on 127.0.0.1; returns the base URL."""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive，和真实服务一样可复用连接
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, code: int, payload: dict):
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                n = int(self.headers.get("Content-Length") or 0)
+                form = parse_qs(self.rfile.read(n).decode("utf-8"))
+                texts = form.get("text", [])
+                tgt = (form.get("target_lang") or ["ZH"])[0]
+                with fake._lock:
+                    fake.calls += 1
+                    fake.chars += sum(len(t) for t in texts)
+                if fake._delay(fake.latency):
+                    with fake._lock:
+                        fake.failures += 1
+                    self._reply(503, {"message": "injected failure"})
+                    return
+                self._reply(200, {"translations": [{"text": f"[{tgt}] {t}"} for t in texts]})
+
+            def do_GET(self):
+                q = parse_qs(urlparse(self.path).query)
+                with fake._lock:
+                    fake.fallback_calls += 1
+                fake._delay(fake.fallback_latency)
+                text = (q.get("q") or [""])[0]
+                self._reply(200, {"responseData": {"translatedText": f"[mm] {text}"}})
+
+        self._server = _QuietServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
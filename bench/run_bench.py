@@ -0,0 +1,253 @@
+"""
+Latency / throughput benchmarks for the capture -> VAD -> Whisper -> translation path.
+Runs offline on a CPU-only box: DeepL and MyMemory are replaced by a local HTTP
+stand-in (fake_deepl.py) with configurable latency and failure injection.
+
+  python bench/run_bench.py                            # synthetic fixture, stub ASR, as fast as possible
+  python bench/run_bench.py talk.wav --model tiny.en   # real Whisper (model must already be cached)
+  python bench/run_bench.py talk.wav --realtime --fail-rate 0.1 --json out.json --max-p95-ms 4000
+  python bench/run_bench.py --realtime --inputs 3 --asr-workers 2   # three speakers sharing the model
+
+Reports VAD throughput, per-caption latency (audio end of the chunk -> output_q put)
+as p50/p95/p99, real-time factor and translation API calls per audio minute.
+"""
+import argparse, bisect, json, os, queue, sys, time
+from types import SimpleNamespace
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "app"))
+
+from asr_engine import AsrEngine, EnergyVadChunker
+from audio_source import ArraySource, load_audio, SR
+from fake_deepl import FakeTranslator
+
+
+# ---------- fixtures / ASR stand-ins ----------
+def synth_speech(seconds: float = 120.0, seed: int = 0) -> np.ndarray:
+    """Speech-like test signal: 4 Hz syllable-modulated bursts between quiet pauses."""
+    rng = np.random.default_rng(seed)
+    parts, total = [], 0
+    while total < seconds * SR:
+        pause = rng.normal(0, 0.003, int(SR * rng.uniform(0.2, 1.2)))
+        n = int(SR * rng.uniform(0.8, 4.0))
+        env = 0.5 + 0.5 * np.sin(2 * np.pi * 4.0 * np.arange(n) / SR + rng.uniform(0, np.pi))
+        parts += [pause, rng.normal(0, 0.12, n) * env]
+        total += len(pause) + n
+    return np.concatenate(parts)[:int(seconds * SR)].astype(np.float32)
+
+
+class StubWhisper:
+    """Stands in for WhisperModel: sleeps `rtf` × audio length, one word per 0.4 s, a full stop every 11 words."""
+    def __init__(self, rtf: float = 0.1):
+        self.rtf = float(rtf)
+
+    def transcribe(self, audio, **kw):
+        dur = len(audio) / SR
+        time.sleep(dur * self.rtf)
+        words = [SimpleNamespace(word=f" w{i}" + ("." if i % 11 == 10 else ""), start=i * 0.4, end=i * 0.4 + 0.3)
+                 for i in range(max(1, int(dur / 0.4)))]
+        text = "".join(w.word for w in words)
+        seg = SimpleNamespace(text=text, start=0.0, end=dur,
+                              words=words if kw.get("word_timestamps") else None)
+        return iter([seg]), None
+
+
+class TimedModel:
+    """Wraps a model and accumulates decode time (the generator is drained here)."""
+    def __init__(self, model):
+        self.model = model
+        self.decode_s = 0.0
+        self.audio_s = 0.0
+
+    def transcribe(self, audio, **kw):
+        t = time.perf_counter()
+        segments, info = self.model.transcribe(audio, **kw)
+        segments = list(segments)
+        self.decode_s += time.perf_counter() - t
+        self.audio_s += len(audio) / SR
+        return iter(segments), info
+
+
+# ---------- engine run ----------
+class TimedQueue(queue.Queue):
+    def put(self, item, block=True, timeout=None):
+        if isinstance(item, dict):
+            item["t_put"] = time.monotonic()
+        super().put(item, block, timeout)
+
+
+def audio_end_time(src: ArraySource, pos: int) -> float:
+    # 环形缓冲位置从 0 开始，与音源已送出的样本数一致
+    i = bisect.bisect_left(src.feed_pos, pos)
+    return src.feed_t[min(i, len(src.feed_t) - 1)]
+
+
+def pct(xs, q):
+    return float(np.percentile(xs, q)) if len(xs) else float("nan")
+
+
+def bench_vad(audio: np.ndarray) -> dict:
+    fl = SR * 20 // 1000
+    usable = len(audio) // fl * fl
+    vad = EnergyVadChunker()
+    t = time.perf_counter()
+    for i in range(0, usable, fl):
+        vad.process(audio[i:i + fl])
+    per_frame = time.perf_counter() - t
+    vad = EnergyVadChunker()
+    t = time.perf_counter()
+    for i in range(0, usable, SR):
+        vad.process_block(audio[i:min(i + SR, usable)])
+    block = time.perf_counter() - t
+    dur = usable / SR
+    return {"vad_frame_x_realtime": dur / per_frame, "vad_block_x_realtime": dur / block}
+
+
+def bench_engine(audio: list, model, base_url: str, fake: FakeTranslator, args) -> dict:
+    # audio: 每路输入一段信号
+    out_q = TimedQueue()
+    timed = TimedModel(model)
+    srcs = [ArraySource(a, realtime=args.realtime, log_times=True) for a in audio]
+    labels = [f"S{i + 1}" for i in range(len(srcs))]
+    eng = AsrEngine(
+        output_q=out_q, source=srcs, deepl_key="bench", target_lang=args.target_lang,
+        input_labels=labels, latency_targets_s=args.speaker_latency_s, asr_workers=args.asr_workers,
+        api_base=base_url, translate_workers=args.translate_workers, translate_budget_s=args.budget_s,
+        overflow_policy=args.overflow_policy, streaming=args.streaming, model=timed,
+        adaptive_chunking=args.adaptive, speech_gate=args.speech_gate, load_shedding=not args.no_shedding,
+        fallback_model=StubWhisper(args.fallback_rtf) if args.fallback_rtf else "",
+        source_first=args.source_first, coalesce_sentences=args.coalesce_s > 0, coalesce_max_delay_s=args.coalesce_s
+    )
+    for tr in eng.translators.values():
+        tr.MYMEMORY_URL = base_url + "/get"
+    finals, sources, partials = [], [], 0
+    t0 = time.monotonic()
+    cpu0 = time.process_time()
+    eng.start()
+    last = time.monotonic()
+    def idle():
+        return (eng.capture_done.is_set() and eng.chunk_q.qsize() == 0 and eng.caption_q.qsize() == 0
+                and eng.in_flight() == 0 and not (eng.coalescer and eng.coalescer.pending) and time.monotonic() - last > args.drain_s)
+
+    while not idle():
+        try:
+            item = out_q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        last = time.monotonic()
+        if item.get("type") == "partial":
+            partials += 1
+        elif item.get("type") == "source":
+            sources.append(item)
+        else:
+            finals.append(item)
+    eng.stop()
+    cpu = time.process_time() - cpu0
+    wall = (finals[-1]["t_put"] if finals else last) - t0
+    src_of = dict(zip(labels, srcs)) if len(srcs) > 1 else {}
+    end_t = lambda c: audio_end_time(src_of.get(c.get("speaker"), srcs[0]), c["utt_end"])
+    lat = [(c["t_put"] - end_t(c)) * 1000.0 for c in finals]
+    src_lat = [(c["t_put"] - end_t(c)) * 1000.0 for c in sources]
+    spk_lat = {l: [(c["t_put"] - end_t(c)) * 1000.0 for c in finals if c.get("speaker") == l] for l in src_of}
+    audio_s = sum(len(a) for a in audio) / SR
+    return {
+        "mode": "realtime" if args.realtime else "asap",
+        "audio_s": audio_s,
+        "captions": sum(1 for c in finals if c.get("lang", eng.langs[0]) == eng.langs[0]),
+        **({"languages": len(eng.langs)} if len(eng.langs) > 1 else {}),
+        **({"inputs": len(srcs), "asr_workers": eng.asr_workers} if len(srcs) > 1 else {}),
+        "partials": partials,
+        "latency_ms_p50": pct(lat, 50),
+        "latency_ms_p95": pct(lat, 95),
+        "latency_ms_p99": pct(lat, 99),
+        **({"src_latency_ms_p50": pct(src_lat, 50), "src_latency_ms_p95": pct(src_lat, 95)} if sources else {}),
+        # 多路：每个说话人的 p95 和开始解码时已过延迟目标的 chunk
+        **{f"latency_ms_p95_{l}": pct(xs, 95) for l, xs in spk_lat.items()},
+        **({"late_chunks": sum(eng.chunk_q.late)} if len(srcs) > 1 else {}),
+        "rtf_wall": wall / audio_s,
+        "rtf_asr": timed.decode_s / audio_s,
+        "cpu_s_per_audio_min": cpu * 60.0 / audio_s,
+        "api_calls_per_min": fake.calls * 60.0 / audio_s,
+        "fallback_calls_per_min": fake.fallback_calls * 60.0 / audio_s,
+        "api_failures": fake.failures,
+        **{k: v for k, v in eng.translator.counters().items()
+           if k in ("hedged", "retries", "budget_exceeded", "deepl_timeouts", "deepl_breaker_opens")},
+        "untranslated": sum(1 for c in finals if str(c.get("tgt", "")).startswith("[no-translation]")),
+        "dropped_chunks": eng.chunk_q.dropped,
+        "merged_chunks": eng.chunk_q.merged,
+        "stale_chunks": eng.stale_chunks,
+        **({"shed_stale": eng.shedder.stale, "shed_untranslated": eng.shedder.untranslated,
+            "fallback_switches": eng.shedder.switches} if eng.shedder else {}),
+        **({"gate_rejected": eng.gate.rejected, "gate_saved_s": eng.gate_saved_s()} if eng.gate else {}),
+        **({"coalesced_groups": eng.coalescer.groups} if eng.coalescer else {}),
+        **({"adaptive_chunk_ms": eng.controller.chunk_ms, "adaptive_changes": eng.controller.changes}
+           if eng.controller else {}),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Offline latency/throughput benchmark")
+    ap.add_argument("fixture", nargs="?", help="WAV/PCM file (default: synthetic speech-like signal)")
+    ap.add_argument("--seconds", type=float, default=120.0, help="length of the synthetic fixture")
+    ap.add_argument("--model", default="", help="Whisper model (e.g. tiny.en); default: stub ASR")
+    ap.add_argument("--compute-type", default="int8")
+    ap.add_argument("--stub-rtf", type=float, default=0.1, help="decode cost of the stub ASR")
+    ap.add_argument("--realtime", action="store_true", help="pace audio in real time")
+    ap.add_argument("--streaming", action="store_true")
+    ap.add_argument("--adaptive", action="store_true", help="adaptive chunk length (ChunkController)")
+    ap.add_argument("--speech-gate", action="store_true", help="Silero gate before Whisper (rejects the synthetic fixture)")
+    ap.add_argument("--source-first", action="store_true", help="push source captions before translation")
+    ap.add_argument("--coalesce-s", type=float, default=0.0,
+                    help="translate whole sentences, holding fragments up to this long (0 = per chunk)")
+    ap.add_argument("--inputs", type=int, default=1, help="simulated speakers, one input each (the fixture, or synthetic signals)")
+    ap.add_argument("--asr-workers", type=int, default=1, help="decoder threads sharing the model across inputs")
+    ap.add_argument("--speaker-latency-s", type=float, default=3.0, help="per-input latency target for the scheduler")
+    ap.add_argument("--no-shedding", action="store_true", help="disable LoadShedder")
+    ap.add_argument("--fallback-rtf", type=float, default=0.0, help="stub fallback model with this decode cost")
+    ap.add_argument("--latency-ms", type=float, default=150.0, help="translator stand-in latency")
+    ap.add_argument("--jitter-ms", type=float, default=50.0)
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="fraction of DeepL requests failing")
+    ap.add_argument("--fallback-latency-ms", type=float, default=300.0, help="MyMemory stand-in latency")
+    ap.add_argument("--budget-s", type=float, default=4.0, help="per-batch translation budget (0 = none)")
+    ap.add_argument("--translate-workers", type=int, default=4)
+    ap.add_argument("--overflow-policy", default="merge")
+    ap.add_argument("--target-lang", default="ZH", help="comma separated for several languages (ZH,JA,ES)")
+    ap.add_argument("--drain-s", type=float, default=2.0, help="idle time that ends a run")
+    ap.add_argument("--json", default="", help="also write results to this file")
+    ap.add_argument("--max-p95-ms", type=float, default=0.0, help="exit 1 if p95 latency exceeds this")
+    args = ap.parse_args(argv)
+
+    n = max(1, args.inputs)
+    audio = [load_audio(args.fixture) if args.fixture else synth_speech(args.seconds, seed=i) for i in range(n)]
+    # 末尾补一段静音，让最后一个 chunk 能正常切出
+    audio = [np.concatenate([a, np.zeros(SR, dtype=np.float32)]) for a in audio]
+    if args.model:
+        from faster_whisper import WhisperModel
+        model = WhisperModel(args.model, device="cpu", compute_type=args.compute_type,
+                             num_workers=max(1, args.asr_workers))
+        list(model.transcribe(np.zeros(SR, dtype=np.float32), beam_size=1, language="en")[0])
+    else:
+        model = StubWhisper(args.stub_rtf)
+
+    fake = FakeTranslator(args.latency_ms, args.jitter_ms, args.fail_rate, args.fallback_latency_ms)
+    base_url = fake.start()
+    try:
+        res = bench_vad(audio[0])
+        res.update(bench_engine(audio, model, base_url, fake, args))
+    finally:
+        fake.stop()
+
+    for k, v in res.items():
+        print(f"{k:>24}: {v:.2f}" if isinstance(v, float) else f"{k:>24}: {v}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=2)
+    if args.max_p95_ms and not res["latency_ms_p95"] <= args.max_p95_ms:
+        print(f"p95 latency {res['latency_ms_p95']:.0f} ms > budget {args.max_p95_ms:.0f} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Cold-start check for the GUI: imports ui, builds MainWindow and paints the first
+frame in a fresh interpreter under `python -X importtime`, then reports
+
+  - import time of everything loaded before first paint (top modules by cumulative time)
+  - wall time to first paint
+  - heavy modules that must NOT be loaded yet (faster_whisper, sounddevice, requests, ...)
+
+  python bench/startup_budget.py                      # report, fail only on forbidden imports
+  python bench/startup_budget.py --max-import-ms 600 --max-paint-ms 1500 --json startup.json
+
+Exit status 1 when a forbidden module is imported or a budget is exceeded.
+"""
+import argparse, json, os, re, subprocess, sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCH_DIR, "..", "app")
+
+# 首帧之前不允许出现的模块（顶层包名）
+FORBIDDEN = ("faster_whisper", "ctranslate2", "tokenizers", "huggingface_hub", "av", "onnxruntime",
+             "sounddevice", "requests", "urllib3", "numpy",
+             "asr_engine", "audio_source", "model_cache", "metrics")
+
+# 子进程里跑的脚本：打印一行 JSON
+PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from PyQt6.QtWidgets import QApplication
+app = QApplication(sys.argv[:1])
+import ui
+ui.prefetch_modules = lambda *a, **k: None  # 后台预取不计入首帧
+w = ui.MainWindow()
+w.show()
+app.processEvents()
+paint_ms = (time.perf_counter() - t0) * 1000.0
+print("@@" + json.dumps({"paint_ms": paint_ms, "modules": sorted({m.split(".")[0] for m in sys.modules})}))
+"""
+
+LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_importtime(stderr: str) -> list:
+    """[(module, self_us, cumulative_us, depth)] from `-X importtime` output."""
+    rows = []
+    for line in stderr.splitlines():
+        m = LINE.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), (len(m.group(3)) - 1) // 2))
+    return rows
+
+
+def run_probe() -> tuple:
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    p = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE], cwd=APP_DIR, env=env,
+                       capture_output=True, text=True, timeout=120)
+    out = [l for l in p.stdout.splitlines() if l.startswith("@@")]
+    if p.returncode != 0 or not out:
+        sys.stderr.write(p.stderr[-4000:])
+        raise SystemExit(f"startup probe failed (exit {p.returncode})")
+    return json.loads(out[-1][2:]), parse_importtime(p.stderr)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="GUI cold-start import/first-paint budget")
+    ap.add_argument("--max-import-ms", type=float, default=0.0, help="fail if imports before first paint exceed this")
+    ap.add_argument("--max-paint-ms", type=float, default=0.0, help="fail if first paint takes longer than this")
+    ap.add_argument("--top", type=int, default=15, help="how many top-level imports to list")
+    ap.add_argument("--json", default="", help="also write results to this file")
+    args = ap.parse_args(argv)
+
+    probe, rows = run_probe()
+    top_level = [r for r in rows if r[3] == 0]
+    import_ms = sum(r[2] for r in top_level) / 1000.0
+    forbidden = sorted(set(FORBIDDEN) & set(probe["modules"]))
+
+    print(f"{'imports before paint':>22}: {import_ms:.0f} ms ({len(rows)} modules)")
+    print(f"{'first paint':>22}: {probe['paint_ms']:.0f} ms")
+    for name, _, cum, _ in sorted(top_level, key=lambda r: -r[2])[:args.top]:
+        print(f"{cum / 1000.0:>20.1f} ms  {name}")
+    res = {"import_ms": import_ms, "paint_ms": probe["paint_ms"], "modules": len(rows), "forbidden": forbidden,
+           "top": [{"module": n, "cumulative_ms": c / 1000.0} for n, _, c, _ in
+                   sorted(top_level, key=lambda r: -r[2])[:args.top]]}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=2)
+
+    failed = False
+    if forbidden:
+        print(f"loaded before first paint: {', '.join(forbidden)}", file=sys.stderr)
+        failed = True
+    if args.max_import_ms and import_ms > args.max_import_ms:
+        print(f"import time {import_ms:.0f} ms > budget {args.max_import_ms:.0f} ms", file=sys.stderr)
+        failed = True
+    if args.max_paint_ms and probe["paint_ms"] > args.max_paint_ms:
+        print(f"first paint {probe['paint_ms']:.0f} ms > budget {args.max_paint_ms:.0f} ms", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())